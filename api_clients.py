@@ -0,0 +1,45 @@
+"""Process-wide OpenAI clients shared across engine instances.
+
+Web backends commonly build one EmothriveAI per user session; giving each
+its own client would also give each a fresh httpx pool and a cold TLS
+handshake. Clients are memoized by API key here so every instance reuses
+the same keep-alive pool for the process lifetime. Instances hold a
+reference but do not own the lifecycle — nothing closes these at session
+end.
+"""
+import functools
+
+import httpx
+from openai import OpenAI, AsyncOpenAI
+
+_LIMITS = dict(
+    max_keepalive_connections=32,
+    max_connections=64,
+    keepalive_expiry=60.0
+)
+_TIMEOUT = dict(connect=3.0)
+
+
+@functools.lru_cache(maxsize=4)
+def shared_async_client(api_key: str) -> AsyncOpenAI:
+    """One AsyncOpenAI per API key, on a shared HTTP/2 keep-alive pool."""
+    return AsyncOpenAI(
+        api_key=api_key,
+        http_client=httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(**_LIMITS),
+            timeout=httpx.Timeout(30.0, **_TIMEOUT)
+        )
+    )
+
+
+@functools.lru_cache(maxsize=4)
+def shared_sync_client(api_key: str) -> OpenAI:
+    """One sync OpenAI per API key, for calls made off the event loop."""
+    return OpenAI(
+        api_key=api_key,
+        http_client=httpx.Client(
+            limits=httpx.Limits(**_LIMITS),
+            timeout=httpx.Timeout(30.0, **_TIMEOUT)
+        )
+    )
@@ -0,0 +1,491 @@
+"""Streamlit chat UI for EmothriveAI.
+
+Launchers (see test.py) import run() from here, so the app body is
+parsed and byte-compiled once however many entry points exist. The
+engine and audio stacks are imported lazily inside their init functions
+so the shell renders before any heavy import runs.
+"""
+import streamlit as st
+import os
+import asyncio
+import atexit
+import threading
+from dataclasses import dataclass
+from typing import Any
+import time
+
+# uvloop's libuv selector shaves per-request overhead on the I/O-bound
+# OpenAI calls; install() sets the policy so the background loop below
+# picks it up. Silently absent on Windows or when not installed.
+try:
+    import uvloop
+    uvloop.install()
+except ImportError:
+    pass
+
+# Page config
+st.set_page_config(
+    page_title="Emothrive AI Test", 
+    page_icon="🧠",
+    layout="wide"
+)
+
+# Custom CSS; built once per process so reruns reuse the same string
+# object instead of reallocating the block each script run
+@st.cache_resource
+def _css():
+    return """
+<style>
+.voice-recording {
+    background-color: #ff4b4b;
+    color: white;
+    padding: 10px;
+    border-radius: 10px;
+    text-align: center;
+    animation: pulse 1.5s infinite;
+}
+
+.voice-processing {
+    background-color: #ffa500;
+    color: white;
+    padding: 10px;
+    border-radius: 10px;
+    text-align: center;
+}
+
+.voice-ready {
+    background-color: #00d4aa;
+    color: white;
+    padding: 10px;
+    border-radius: 10px;
+    text-align: center;
+}
+
+@keyframes pulse {
+    0% { opacity: 1; }
+    50% { opacity: 0.6; }
+    100% { opacity: 1; }
+}
+</style>
+"""
+
+
+st.markdown(_css(), unsafe_allow_html=True)
+
+# All voice-system state behind one session key: each attribute write on
+# SessionStateProxy re-enters the dict-like wrapper, so the callbacks
+# fetch this object once and mutate plain fields
+@dataclass
+class VoiceState:
+    system: Any = None
+    recording: bool = False
+    transcript: str = ""
+    status: str = "ready"
+
+
+# Initialize session state
+def init_session_state():
+    defaults = {
+        'ai_initialized': False,
+        # History as parallel columns (SoA): the render loop zips them
+        # instead of doing per-dict key lookups, and timestamps are
+        # formatted once at append time rather than on every rerun
+        'hist_roles': [],
+        'hist_contents': [],
+        'hist_times': [],
+        'hist_sources': [],
+        'hist_therapy': [],
+        'last_update': 0,
+        'pending_voice_message': None,  # New flag for voice messages
+        'pending_future': None,  # In-flight AI call, polled between reruns
+        'stream_buf': None  # Accumulates streamed tokens for the live reply
+    }
+    
+    for key, value in defaults.items():
+        if key not in st.session_state:
+            st.session_state[key] = value
+    if 'voice' not in st.session_state:
+        st.session_state.voice = VoiceState()
+
+def _hms(ts, _cache={}):
+    """Format ts as H:M:S, reusing the string for same-second appends.
+
+    Skips the datetime allocation and tz conversion of
+    datetime.now().strftime() on the append path; the one-slot cache
+    covers bursts (streamed turns, suggestion clicks) landing in the
+    same second.
+    """
+    key = int(ts)
+    value = _cache.get(key)
+    if value is None:
+        value = time.strftime("%H:%M:%S", time.localtime(ts))
+        _cache.clear()
+        _cache[key] = value
+    return value
+
+
+def append_history(role, content, source, therapy_type=''):
+    st.session_state.hist_roles.append(role)
+    st.session_state.hist_contents.append(content)
+    st.session_state.hist_times.append(_hms(time.time()))
+    st.session_state.hist_sources.append(source)
+    st.session_state.hist_therapy.append(therapy_type)
+
+
+# Voice callback functions - Fixed for Streamlit
+# There is no partial-transcript handler: RealTimeVoiceInput transcribes
+# a whole utterance after silence, so no partial hypotheses ever arrive.
+def on_final_transcript(transcript):
+    """Called when final transcript is ready - Fixed version"""
+    try:
+        # Strip once and reuse for both the history entry and the flag
+        transcript = transcript.strip()
+        if transcript:
+            # Add user message to session state safely
+            if 'hist_roles' in st.session_state:
+                append_history('user', transcript, 'voice')
+
+            # Set flag to process message in main thread
+            st.session_state.pending_voice_message = transcript
+            
+        # Reset voice state
+        voice = st.session_state.voice
+        voice.recording = False
+        voice.transcript = ''
+        voice.status = 'ready'
+        
+    except Exception as e:
+        print(f"Callback error: {e}")  # Use print instead of st functions
+
+def on_recording_start():
+    """Called when recording starts - Simplified"""
+    try:
+        voice = st.session_state.voice
+        voice.recording = True
+        voice.status = 'recording'
+    except:
+        pass
+
+def on_recording_stop():
+    """Called when recording stops - Simplified"""
+    try:
+        st.session_state.voice.status = 'processing'
+    except:
+        pass
+
+# Long-lived event loop in a background thread. Creating a fresh loop per
+# message throws away the AsyncOpenAI client's keep-alive connections each
+# time; one persistent loop keeps the httpx pool warm across messages.
+@st.cache_resource
+def get_background_loop():
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+
+    def _shutdown():
+        loop.call_soon_threadsafe(loop.stop)
+        # Session state is gone by interpreter exit in some runtimes
+        try:
+            voice = st.session_state.get('voice')
+            if voice is not None and voice.system is not None:
+                voice.system.cleanup()
+        except Exception:
+            pass
+
+    atexit.register(_shutdown)
+    return loop
+
+# One engine per process and API key: cache_resource shares the instance
+# (and its warm httpx pool and loaded embedding model) across sessions,
+# tabs and refreshes instead of rebuilding it per session
+@st.cache_resource
+def _get_ai(openai_key: str):
+    # The engine drags in the OpenAI SDK, FAISS and the embedding
+    # model; deferred here (and cached) so the shell paints first
+    from main import EmothriveAI, EmothriveBackendInterface
+    ai_engine = EmothriveAI(openai_api_key=openai_key)
+    return ai_engine, EmothriveBackendInterface(ai_engine)
+
+
+def init_ai_system():
+    openai_key = os.getenv("OPENAI_API_KEY")
+    if not openai_key:
+        return None, "OpenAI API Key not found. Please set OPENAI_API_KEY in your environment."
+
+    try:
+        return _get_ai(openai_key), None
+    except Exception as e:
+        return None, f"Failed to initialize AI: {str(e)}"
+
+# Initialize voice system
+def init_voice_system():
+    if st.session_state.voice.system is None:
+        try:
+            # Imported here so text-only launchers skip the PyAudio and
+            # Whisper-client imports entirely
+            from voice_input import RealTimeVoiceInput
+            voice_system = RealTimeVoiceInput(
+                silence_threshold=400,
+                silence_duration=2.0
+            )
+            voice_system.set_callbacks(
+                on_final_transcript=on_final_transcript,
+                on_recording_start=on_recording_start,
+                on_recording_stop=on_recording_stop
+            )
+            st.session_state.voice.system = voice_system
+            return True, None
+        except Exception as e:
+            return False, str(e)
+    return True, None
+
+async def _consume_stream(ai_engine, request, buf):
+    """Pump streamed tokens into buf on the background loop.
+
+    The script thread reads buf between reruns; dict mutation is atomic
+    under the GIL, so no extra locking is needed for this one-producer,
+    one-reader handoff.
+    """
+    try:
+        async for chunk in ai_engine.process_message_stream(request):
+            buf['text'] += chunk
+    except Exception as e:
+        buf['error'] = str(e)
+    buf['done'] = True
+
+
+# Submit a message without blocking the script thread; tokens stream
+# into a buffer the UI polls between reruns, so the first words appear
+# after ~200-400ms instead of the full 1-3s completion time
+def submit_message(message, source='text'):
+    try:
+        ai_data, error = init_ai_system()
+        if error:
+            st.error(error)
+            return
+
+        ai_engine, backend = ai_data
+        request = {'message': message, 'source': source}
+        buf = {'text': '', 'done': False, 'error': None}
+        st.session_state.stream_buf = buf
+        st.session_state.pending_future = asyncio.run_coroutine_threadsafe(
+            _consume_stream(ai_engine, request, buf), get_background_loop()
+        )
+    except Exception as e:
+        st.error(f"Processing error: {str(e)}")
+
+
+def finish_pending_message():
+    """Fold a finished streamed reply into history; True while streaming."""
+    buf = st.session_state.stream_buf
+    if buf is None:
+        return False
+    if not buf['done']:
+        return True
+
+    st.session_state.pending_future = None
+    st.session_state.stream_buf = None
+
+    if buf['error'] is None and buf['text']:
+        append_history('assistant', buf['text'], 'ai')
+    else:
+        append_history('assistant', f"Error: {buf['error'] or 'No response generated'}", 'ai')
+    return False
+
+# st.fragment scopes a rerun to the decorated block, so interacting with
+# one section doesn't re-render the others (notably the O(N) history
+# loop); on older Streamlit without fragments this is a no-op passthrough
+_fragment = getattr(st, "fragment", lambda f: f)
+
+
+@_fragment
+def render_voice_controls(voice_success, voice_error):
+    col1, col2, col3 = st.columns(3)
+
+    with col1:
+        # Voice controls
+        if voice_success:
+            voice = st.session_state.voice
+            if voice.recording:
+                if st.button("🛑 Stop Recording", type="secondary"):
+                    voice.system.stop_recording()
+            else:
+                if st.button("🎤 Start Recording", type="primary"):
+                    voice.system.start_recording()
+        else:
+            st.button("🎤 Voice Unavailable", disabled=True)
+            if voice_error:
+                st.caption(f"Error: {voice_error}")
+
+    with col2:
+        # Voice status
+        if st.session_state.voice.status == 'recording':
+            st.markdown('<div class="voice-recording">🎤 Recording... Speak now</div>', unsafe_allow_html=True)
+        elif st.session_state.voice.status == 'processing':
+            st.markdown('<div class="voice-processing">🔄 Processing speech...</div>', unsafe_allow_html=True)
+        else:
+            st.markdown('<div class="voice-ready">✅ Voice Ready</div>', unsafe_allow_html=True)
+
+    with col3:
+        if st.button("🔄 Reset Chat"):
+            for key in ('hist_roles', 'hist_contents', 'hist_times',
+                        'hist_sources', 'hist_therapy'):
+                st.session_state[key] = []
+            st.session_state.voice.transcript = ''
+            st.rerun()
+
+
+@_fragment
+def render_live_transcript():
+    voice = st.session_state.voice
+    if voice.transcript or voice.recording:
+        st.markdown("### 🎤 Live Transcript")
+        if voice.transcript:
+            st.info(f"**Current Speech:** {voice.transcript}")
+        elif voice.recording:
+            st.info("**Listening...** Start speaking...")
+
+
+@_fragment
+def render_history():
+    if not st.session_state.hist_roles:
+        st.info("👋 Start a conversation by typing a message or using voice input above!")
+        st.markdown("**Suggestions:**")
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("😟 I'm feeling anxious"):
+                append_history('user', "I'm feeling anxious", 'text')
+                submit_message("I'm feeling anxious", 'text')
+                st.rerun()
+        with col2:
+            if st.button("💭 I need someone to talk to"):
+                append_history('user', "I need someone to talk to", 'text')
+                submit_message("I need someone to talk to", 'text')
+                st.rerun()
+    else:
+        # Native chat widgets: a purpose-built React component with
+        # client-side diffing, instead of pushing raw HTML through the
+        # slower ReactMarkdown path
+        for role, content, timestamp, source, therapy_type in zip(
+                st.session_state.hist_roles,
+                st.session_state.hist_contents,
+                st.session_state.hist_times,
+                st.session_state.hist_sources,
+                st.session_state.hist_therapy):
+            with st.chat_message(role):
+                st.write(content)
+                if role == 'user':
+                    icon = "🎤" if source == 'voice' else "💬"
+                    st.caption(f"{icon} {timestamp}")
+                else:
+                    therapy_info = f" | {therapy_type}" if therapy_type else ""
+                    st.caption(f"{timestamp}{therapy_info}")
+
+    buf = st.session_state.stream_buf
+    if buf is not None:
+        with st.chat_message('assistant'):
+            st.write(buf['text'] or '_typing..._')
+
+
+# Main app
+def main(enable_voice: bool = True):
+    init_session_state()
+
+    st.title("🧠 Emothrive AI - Test Interface")
+    st.markdown("*Simple testing interface for AI therapy chatbot with voice input*")
+
+    # Initialize systems
+    ai_data, ai_error = init_ai_system()
+    if ai_error:
+        st.error(ai_error)
+        st.stop()
+
+    if enable_voice:
+        voice_success, voice_error = init_voice_system()
+    else:
+        voice_success, voice_error = False, None
+
+    # The STT callback thread only flags the transcript; it is handed to
+    # the AI here on the script thread, which submits it to the shared
+    # background loop. Scheduling coroutines from the callback thread
+    # itself would need a running loop there and would drop transcripts.
+    pending = st.session_state.pending_voice_message
+    if pending:
+        st.session_state.pending_voice_message = None
+        submit_message(pending, 'voice')
+
+    # Fold a finished AI reply into the history before rendering
+    waiting_on_ai = finish_pending_message()
+
+    # Controls section
+    st.markdown("## 🎛️ Controls")
+    render_voice_controls(voice_success, voice_error)
+
+    # Live transcript display
+    render_live_transcript()
+
+
+    # Text input section
+    # Native chat input auto-clears on submit, so no form wrapper or
+    # widget-key churn is needed to reset the box each turn
+    user_input = st.chat_input(
+        "How are you feeling today?",
+        disabled=st.session_state.voice.recording
+    )
+    if user_input:
+        user_input = user_input.strip()
+        if user_input:
+            append_history('user', user_input, 'text')
+            # The rerun shows the typing indicator while the call is in
+            # flight
+            submit_message(user_input, 'text')
+            st.rerun()
+
+    # Conversation display
+    st.markdown("## 💬 Conversation")
+    render_history()
+
+
+    # Debug info (collapsible)
+    with st.expander("🔧 Debug Info"):
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            st.write("**Session State:**")
+            st.json({
+                'ai_initialized': st.session_state.ai_initialized,
+                'is_recording': st.session_state.voice.recording,
+                'voice_status': st.session_state.voice.status,
+                'messages_count': len(st.session_state.hist_roles),
+                'current_transcript_length': len(st.session_state.voice.transcript)
+            })
+        
+        with col2:
+            st.write("**Voice System:**")
+            if st.session_state.voice.system:
+                status = st.session_state.voice.system.get_status()
+                st.json(status)
+            else:
+                st.write("Voice system not initialized")
+    
+    # Auto-refresh for voice updates and to poll the in-flight AI call;
+    # the tighter interval while streaming keeps the live reply flowing
+    if waiting_on_ai:
+        time.sleep(0.1)
+        st.rerun()
+    elif st.session_state.voice.recording:
+        time.sleep(0.3)
+        st.rerun()
+
+def run(enable_voice: bool = True):
+    """Entry point for launcher scripts (see test.py)."""
+    try:
+        main(enable_voice=enable_voice)
+    except KeyboardInterrupt:
+        st.write("Application stopped")
+    except Exception as e:
+        st.error(f"Application error: {str(e)}")
+        st.exception(e)
+
+
+if __name__ == "__main__":
+    run()
\ No newline at end of file
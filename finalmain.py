@@ -1,13 +1,26 @@
 import os
+import json
+import time
+import re
+import random
 import asyncio
+import hashlib
+import threading
 import logging
-from typing import Dict, List
-from datetime import datetime
-from openai import OpenAI
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, List
 
+import numpy as np
+from openai import APIConnectionError, InternalServerError, RateLimitError
+
+from api_clients import shared_async_client, shared_sync_client
 from pdf_processor import PDFVectorStore
-from prompt import TherapyType, PromptManager, ConversationStyle
-from voice import VoiceInput
+from prompt import TherapyType, PromptManager, ConversationStyle, make_message
+from semantic_cache import EmbeddingCache, SemanticCache, register_exit_save
+from text_filters import (
+    THERAPY_PATTERN, WARM_CUT_UNSAFE, WARM_CUT_WINDOW, WARM_TAIL,
+    normalize_message, warm_sub
+)
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -15,16 +28,105 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Quick responses for common queries, built once at import time.
+# Keys are normalized (lowercase, no punctuation, collapsed whitespace) so
+# "Hi!", "HI" and "hi\n" all hit without rebuilding the dict per call.
+_SIMPLE_RESPONSES = {normalize_message(k): v for k, v in {
+    "how are you?": "I'm here and ready to help. How are you feeling today?",
+    "please find me a girlfriend": "Building connections takes time, but I'm here to guide you. How do you feel about trying new social activities?",
+    "what kind of therapy do you suggest?": "I recommend Cognitive Behavioral Therapy (CBT) for building confidence. Would you like to learn more?",
+    "hi": "Hello! How can I support you today?"
+}.items()}
+# Messages longer than the longest key (plus slack for collapsible
+# whitespace) can't be canned replies; checking len first skips the
+# normalization pass on long therapy messages
+_SIMPLE_MAXLEN = max(map(len, _SIMPLE_RESPONSES)) + 8
+_SIMPLE_FIRST_CHARS = frozenset(k[0] for k in _SIMPLE_RESPONSES)
+
+def _simple_lookup(message: str):
+    """Canned reply for message, or None.
+
+    Two cheap rejections (length, then first letter) guard the full
+    normalization, so ordinary therapy messages never pay for it. Leading
+    whitespace or punctuation falls through to the full check.
+    """
+    if len(message) > _SIMPLE_MAXLEN:
+        return None
+    first = message[:1].lower()
+    if first.isalnum() and first not in _SIMPLE_FIRST_CHARS:
+        return None
+    return _SIMPLE_RESPONSES.get(normalize_message(message))
+
+# Output tokens dominate wall time per request; the cap is deployment-
+# tunable and the stop sequence cuts decoding short if the model starts
+# scripting the user's next turn
+_MAX_TOKENS = int(os.getenv("OPENAI_MAX_TOKENS", "400"))
+_STOP = ["\nUser:"]
+
+def _word_count_lt(text: str, n: int) -> bool:
+    """True if text has fewer than n whitespace-separated words.
+
+    Scans characters with an early exit instead of allocating the list
+    split() would build just to be counted.
+    """
+    words = 0
+    in_word = False
+    for ch in text:
+        if ch.isspace():
+            in_word = False
+        elif not in_word:
+            in_word = True
+            words += 1
+            if words >= n:
+                return False
+    return True
+
+# Short messages semantically close to these always go to the full model;
+# everything else still gets the cheap canned "tell me more" reply
+_FULL_MODEL_EXEMPLARS = [
+    "I feel suicidal",
+    "I want to hurt myself",
+    "I want to end my life",
+    "I don't want to live anymore",
+    "I'm thinking about killing myself",
+    "I can't keep going",
+    "I feel completely hopeless",
+    "Someone is hurting me",
+    "I was abused",
+    "I'm having a panic attack",
+    "I can't stop crying",
+    "I'm scared of what I might do",
+    "I relapsed",
+    "I feel like a danger to myself"
+]
+
 class EmothriveAI:
+    # One instance exists per user session on a multi-tenant server;
+    # dropping the per-instance __dict__ shrinks each session object and
+    # makes attribute loads in the hot process_message path slot lookups
+    __slots__ = (
+        'client', '_sync_client', 'pdf_store',
+        'prompt_manager', 'model', 'voice_input', 'conversation_history',
+        'semantic_cache', 'session_data', '_exemplar_matrix',
+        '_history_summary', 'max_concurrency', '_kb_ready',
+        '_embedding_cache'
+    )
+
     def __init__(
         self,
         openai_api_key: str,
         pdf_folder: str = './pdf/',
         default_therapy_type: TherapyType = TherapyType.GENERAL,
         model: str = None,
-        enable_voice: bool = False
+        enable_voice: bool = False,
+        max_concurrency: int = 8,
+        history_window: int = 20
     ):
-        self.client = OpenAI(api_key=openai_api_key)
+        # Clients are memoized per API key and share one keep-alive pool
+        # across all engine instances in the process (see api_clients.py);
+        # this instance does not own their lifecycle
+        self.client = shared_async_client(openai_api_key)
+        self._sync_client = shared_sync_client(openai_api_key)
         
         self.pdf_store = PDFVectorStore(folder_path=pdf_folder)
         self.prompt_manager = PromptManager(
@@ -33,18 +135,60 @@ class EmothriveAI:
         )
         
         self.model = model or os.getenv('OPENAI_MODEL', 'gpt-4.1-mini')
-        self.voice_input = VoiceInput() if enable_voice else None
-        self.conversation_history: List[Dict] = []
+        # Ceiling on simultaneous in-flight requests for the bulk entry
+        # point; keeps bursts under the account's RPM/TPM caps
+        self.max_concurrency = max_concurrency
+        if enable_voice:
+            # The audio stack (PyAudio, sounddevice) costs hundreds of ms
+            # to import; text-only deployments never pay for it
+            from voice import VoiceInput
+            self.voice_input = VoiceInput()
+        else:
+            self.voice_input = None
+        # Bounded history: once it exceeds 24 turns the oldest 12 are folded
+        # into a running summary, so per-request input tokens stay O(1)
+        # without losing long-session context outright; maxlen is a backstop
+        # in case summarization keeps failing
+        # Ring buffer of the last history_window turns (two dicts per turn):
+        # memory stays bounded per session and the payload sent to the API
+        # is capped without an explicit trim pass
+        self.conversation_history: Deque[Dict] = deque(maxlen=history_window * 2)
+        self._history_summary = ""
+
+        # Semantic cache skips the OpenAI call for near-duplicate messages.
+        # It shares the PDF store's local MiniLM encoder so each message is
+        # embedded once for both cache lookup and retrieval, with no
+        # embeddings API round trip.
+        self.semantic_cache = SemanticCache(
+            self._sync_client,
+            embed_fn=self.pdf_store.embeddings.embed_query,
+            embedding_dim=384
+        )
+        # Process-level, weakly referenced: does not pin this instance and
+        # exits write the shared cache path once, not once per engine
+        register_exit_save(self.semantic_cache)
+        # Repeated and near-identical phrasings skip the encoder entirely
+        self._embedding_cache = EmbeddingCache(self.pdf_store.embeddings.embed_query)
         
-        # Session tracking for analytics and user experience
+        # Session tracking for analytics and user experience.
+        # time.time_ns is far cheaper than datetime.strftime (no locale or
+        # tz lookups) and keeps instance creation light; the unused
+        # therapy_types_used set is gone until a reader exists.
         self.session_data = {
-            'session_id': datetime.now().strftime("%Y%m%d_%H%M%S"),
-            'start_time': datetime.now(),
-            'messages_count': 0,
-            'therapy_types_used': set()
+            'session_id': f"{time.time_ns():x}",
+            'start_time_mono': time.monotonic(),
+            'messages_count': 0
         }
         
-        self._initialize_knowledge_base()
+        # Exemplar embeddings for the short-message gate, built on first use
+        self._exemplar_matrix = None
+
+        # Loading or building the FAISS index can take seconds; doing it in
+        # the background lets the constructor return immediately and the
+        # first messages overlap the cold start (they just skip PDF context
+        # until the store is ready)
+        self._kb_ready = threading.Event()
+        threading.Thread(target=self._initialize_knowledge_base, daemon=True).start()
         logger.info(f"EmothriveAI initialized with model: {self.model}")
 
     def _initialize_knowledge_base(self):
@@ -56,74 +200,404 @@ class EmothriveAI:
         except Exception as e:
             logger.error(f"Error initializing knowledge base: {e}")
             logger.warning("Continuing without PDF knowledge base")
+        finally:
+            self._kb_ready.set()
+
+    def _needs_full_model(self, message: str) -> bool:
+        """Decide whether a short message is too high-stakes for a canned reply.
+
+        A single MiniLM embedding (~8ms on CPU) compared against crisis
+        exemplars keeps the API-call-skipping fast path for small talk while
+        routing messages like "I feel suicidal" to the full model. Errs on
+        the side of the full model if the check itself fails.
+        """
+        try:
+            if self._exemplar_matrix is None:
+                vectors = np.asarray(
+                    self.pdf_store.embeddings.embed_documents(_FULL_MODEL_EXEMPLARS),
+                    dtype=np.float32
+                )
+                vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+                self._exemplar_matrix = vectors
+            query = np.asarray(
+                self._embedding_cache.get_or_embed(message), dtype=np.float32
+            )
+            norm = float(np.linalg.norm(query))
+            if norm == 0.0:
+                return False
+            query /= norm
+            return float(np.max(self._exemplar_matrix @ query)) > 0.6
+        except Exception as e:
+            logger.warning(f"Short-message gate failed, using full model: {e}")
+            return True
 
     async def process_message(self, request_data: Dict) -> Dict:
         user_message = request_data.get("message", "")
-        
+
         if not user_message:
             return {"success": False, "error": "No message provided"}
 
-        # Quick responses for common queries - improves response time
-        simple_responses = {
-            "how are you?": "I'm here and ready to help. How are you feeling today?",
-            "please find me a girlfriend": "Building connections takes time, but I'm here to guide you. How do you feel about trying new social activities?",
-            "what kind of therapy do you suggest?": "I recommend Cognitive Behavioral Therapy (CBT) for building confidence. Would you like to learn more?",
-            "hi": "Hello! How can I support you today?"
-        }
-        
-        if user_message.lower() in simple_responses:
+        simple_hit = _simple_lookup(user_message)
+        if simple_hit:
             self.session_data['messages_count'] += 1
-            return {"success": True, "response": {"text": simple_responses[user_message.lower()]}}
+            return {"success": True, "response": {"text": simple_hit}}
         
         # Handle brief messages that need more context
         if self.session_data['messages_count'] > 0 and user_message:
-            if len(user_message.split()) < 10:  
+            if _word_count_lt(user_message, 10) and not await asyncio.to_thread(
+                    self._needs_full_model, user_message):
                 response_text = (
                     "It sounds like you're going through something important. Could you share more about how you're feeling or what challenges you're facing? I'm here to help."
                 )
                 self.session_data['messages_count'] += 1
                 return {"success": True, "response": {"text": response_text}}
 
-        # Get PDF context
-        pdf_context = ""
-        if self.pdf_store and self.pdf_store.vector_store:
-            pdf_context = self.pdf_store.retrieve_pdf_context(user_message)
-        
+        # Embed the message once; the same vector drives both the semantic
+        # cache probe and the PDF similarity search
+        try:
+            query_embedding = await asyncio.to_thread(
+                self._embedding_cache.get_or_embed, user_message
+            )
+        except Exception as e:
+            logger.warning(f"Query embedding failed: {e}")
+            query_embedding = None
+
+        # Kick off PDF retrieval early so it overlaps the cache lookup;
+        # both are independent latency sources. Short turns skip retrieval
+        # outright: greetings carry too little signal to match useful
+        # chunks, and the empty context keeps the prompt prefix cacheable
+        pdf_task = None
+        if (self._kb_ready.is_set() and self.pdf_store.vector_store
+                and not _word_count_lt(user_message, 10)):
+            pdf_task = asyncio.create_task(asyncio.to_thread(
+                self.pdf_store.retrieve_pdf_context, user_message,
+                query_embedding=query_embedding
+            ))
+
+        # Semantic cache: reuse a prior response for near-duplicate messages
+        context_hash = self._context_hash()
+        cached_response = await asyncio.to_thread(
+            self.semantic_cache.lookup, user_message, context_hash,
+            query_embedding
+        )
+        if cached_response:
+            if pdf_task:
+                pdf_task.cancel()
+            self.session_data['messages_count'] += 1
+            return {"success": True, "response": {"text": cached_response}}
+
+        pdf_context = await pdf_task if pdf_task else ""
+
         # Create messages
         messages = self.prompt_manager.create_conversation_messages(
             user_input=user_message,
             pdf_context=pdf_context,
-            conversation_history=self.conversation_history
+            conversation_history=self._history_for_prompt()
         )
         
         try:
-            response = self.client.chat.completions.create(
+            response = await self._call_with_retry(
                 model=self.model,
                 messages=messages,
-                max_tokens=400
+                max_tokens=_MAX_TOKENS,
+                stop=_STOP,
+                temperature=0.6
             )
             response_text = response.choices[0].message.content
             response_text = self._make_warm_and_supportive(response_text)
 
             # Update conversation history
-            self.conversation_history.append({"role": "user", "content": user_message})
-            self.conversation_history.append({"role": "assistant", "content": response_text})
+            self.conversation_history.append(make_message("user", user_message))
+            self.conversation_history.append(make_message("assistant", response_text))
             
             # Update session data
             self.session_data['messages_count'] += 1
 
+            await asyncio.to_thread(
+                self.semantic_cache.store, user_message, response_text,
+                context_hash, query_embedding
+            )
+            # Compact old history off the critical path
+            asyncio.create_task(self._maybe_summarize_history())
+
             return {"success": True, "response": {"text": response_text}}
         except Exception as e:
             logger.error(f"Error during OpenAI API call: {e}")
             return {"success": False, "error": str(e)}
 
+    async def process_message_stream(self, request_data: Dict) -> AsyncIterator[str]:
+        """Yield the assistant reply incrementally as it streams from OpenAI.
+
+        Text starts flowing after the first token instead of after the full
+        completion, cutting perceived latency from seconds to ~300ms. The
+        warm-tone substitutions run on completed text only: at least the
+        longest pattern stays buffered and the emit boundary never sits
+        inside a pattern, so no substitution can straddle an emit; the
+        therapy follow-up is appended once the full text is known.
+        """
+        user_message = request_data.get("message", "")
+        if not user_message:
+            return
+
+        simple_hit = _simple_lookup(user_message)
+        if simple_hit:
+            self.session_data['messages_count'] += 1
+            yield simple_hit
+            return
+
+        if (self.session_data['messages_count'] > 0 and _word_count_lt(user_message, 10)
+                and not await asyncio.to_thread(self._needs_full_model, user_message)):
+            self.session_data['messages_count'] += 1
+            yield (
+                "It sounds like you're going through something important. Could you share more about how you're feeling or what challenges you're facing? I'm here to help."
+            )
+            return
+
+        try:
+            query_embedding = await asyncio.to_thread(
+                self._embedding_cache.get_or_embed, user_message
+            )
+        except Exception as e:
+            logger.warning(f"Query embedding failed: {e}")
+            query_embedding = None
+
+        # Short turns skip retrieval; see process_message
+        pdf_task = None
+        if (self._kb_ready.is_set() and self.pdf_store.vector_store
+                and not _word_count_lt(user_message, 10)):
+            pdf_task = asyncio.create_task(asyncio.to_thread(
+                self.pdf_store.retrieve_pdf_context, user_message,
+                query_embedding=query_embedding
+            ))
+
+        context_hash = self._context_hash()
+        cached_response = await asyncio.to_thread(
+            self.semantic_cache.lookup, user_message, context_hash,
+            query_embedding
+        )
+        if cached_response:
+            if pdf_task:
+                pdf_task.cancel()
+            self.session_data['messages_count'] += 1
+            yield cached_response
+            return
+
+        pdf_context = await pdf_task if pdf_task else ""
+
+        messages = self.prompt_manager.create_conversation_messages(
+            user_input=user_message,
+            pdf_context=pdf_context,
+            conversation_history=self._history_for_prompt()
+        )
+
+        stream = await self._call_with_retry(
+            model=self.model,
+            messages=messages,
+            max_tokens=_MAX_TOKENS,
+            stop=_STOP,
+            temperature=0.6,
+            stream=True
+        )
+
+        buffer = ""
+        parts: List[str] = []
+        async for chunk in stream:
+            token = chunk.choices[0].delta.content if chunk.choices else None
+            if not token:
+                continue
+            buffer += token
+            # Emit up to a space that leaves at least the longest pattern
+            # buffered, so a pattern still arriving is never split; if the
+            # text ending at the cut could be a pattern's first word —
+            # after any non-word character, not just a space — back the
+            # cut off to that boundary so it cannot land on the pattern's
+            # internal space
+            cut = buffer.rfind(" ", 0, len(buffer) - WARM_TAIL)
+            while cut > 0 and (unsafe := WARM_CUT_UNSAFE.search(
+                    buffer, max(0, cut - WARM_CUT_WINDOW), cut)):
+                cut = unsafe.start()
+            if cut > 0:
+                ready = warm_sub(buffer[:cut + 1])
+                buffer = buffer[cut + 1:]
+                parts.append(ready)
+                yield ready
+        if buffer:
+            ready = warm_sub(buffer)
+            parts.append(ready)
+            yield ready
+
+        response_text = "".join(parts)
+        if THERAPY_PATTERN.search(response_text):
+            suffix = "\nI'm here to guide you through this process, and you're not alone in it."
+            response_text += suffix
+            yield suffix
+
+        self.conversation_history.append(make_message("user", user_message))
+        self.conversation_history.append(make_message("assistant", response_text))
+        self.session_data['messages_count'] += 1
+
+        await asyncio.to_thread(
+            self.semantic_cache.store, user_message, response_text,
+            context_hash, query_embedding
+        )
+        # Compact old history off the critical path
+        asyncio.create_task(self._maybe_summarize_history())
+
+    async def process_messages_concurrent(self, requests_data: List[Dict]) -> List[Dict]:
+        """Process many messages concurrently, bounded by max_concurrency.
+
+        The workload is I/O-bound on OpenAI latency, so throughput scales
+        with in-flight requests until the rate limits; the semaphore keeps
+        bursts under them. For offline jobs where latency doesn't matter,
+        prefer process_messages_batch (half-price tokens).
+        """
+        sem = asyncio.Semaphore(self.max_concurrency)
+
+        async def bounded(request_data: Dict) -> Dict:
+            async with sem:
+                return await self.process_message(request_data)
+
+        results = await asyncio.gather(
+            *(bounded(r) for r in requests_data), return_exceptions=True
+        )
+        return [
+            r if not isinstance(r, BaseException) else {"success": False, "error": str(r)}
+            for r in results
+        ]
+
+    async def process_messages_batch(self, requests_data: List[Dict], poll_interval: float = 30.0) -> List[Dict]:
+        """Process many messages offline through OpenAI's Batch API.
+
+        Suited to non-interactive workloads (log replay, evaluation runs):
+        half-price tokens, a separate rate-limit pool, and a single upload
+        instead of one network round trip per request.
+        """
+        user_messages = [r.get("message", "") for r in requests_data]
+        # One batched FAISS search for the whole job instead of a
+        # Python-FAISS round trip per message
+        if self.pdf_store and self.pdf_store.vector_store:
+            contexts = await asyncio.to_thread(
+                self.pdf_store.retrieve_pdf_context_batch, user_messages
+            )
+        else:
+            contexts = [""] * len(user_messages)
+
+        lines = []
+        for i, (user_message, pdf_context) in enumerate(zip(user_messages, contexts)):
+            messages = self.prompt_manager.create_conversation_messages(
+                user_input=user_message,
+                pdf_context=pdf_context
+            )
+            lines.append(json.dumps({
+                "custom_id": str(i),
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {"model": self.model, "messages": messages,
+                         "max_tokens": _MAX_TOKENS, "stop": _STOP, "temperature": 0.6}
+            }))
+
+        results: List[Dict] = [{"success": False, "error": "No response in batch output"}] * len(requests_data)
+        try:
+            batch_file = await self.client.files.create(
+                file=("batch_requests.jsonl", "\n".join(lines).encode()),
+                purpose="batch"
+            )
+            batch = await self.client.batches.create(
+                input_file_id=batch_file.id,
+                endpoint="/v1/chat/completions",
+                completion_window="24h"
+            )
+            logger.info(f"Batch {batch.id} submitted with {len(lines)} requests")
+
+            while batch.status not in ("completed", "failed", "expired", "cancelled"):
+                await asyncio.sleep(poll_interval)
+                batch = await self.client.batches.retrieve(batch.id)
+
+            if batch.status != "completed":
+                return [{"success": False, "error": f"Batch ended with status {batch.status}"}] * len(requests_data)
+
+            output = await self.client.files.content(batch.output_file_id)
+            for line in output.text.splitlines():
+                entry = json.loads(line)
+                index = int(entry["custom_id"])
+                body = (entry.get("response") or {}).get("body") or {}
+                choices = body.get("choices")
+                if choices:
+                    response_text = self._make_warm_and_supportive(choices[0]["message"]["content"])
+                    results[index] = {"success": True, "response": {"text": response_text}}
+            return results
+        except Exception as e:
+            logger.error(f"Batch processing failed: {e}")
+            return [{"success": False, "error": str(e)}] * len(requests_data)
+
+    async def _call_with_retry(self, **kwargs):
+        """Create a chat completion, retrying transient failures.
+
+        Three attempts with capped exponential backoff plus jitter turn the
+        occasional 429/5xx/connection blip into a successful turn instead of
+        a lost one. Non-transient errors raise immediately.
+        """
+        for attempt in range(3):
+            try:
+                return await self.client.chat.completions.create(**kwargs)
+            except (RateLimitError, APIConnectionError, InternalServerError) as e:
+                if attempt == 2:
+                    raise
+                delay = min(8.0, 0.5 * (2 ** attempt)) + random.random() * 0.1
+                logger.warning(
+                    f"OpenAI call failed ({type(e).__name__}), retrying in {delay:.1f}s"
+                )
+                await asyncio.sleep(delay)
+
+    def _history_for_prompt(self) -> List[Dict]:
+        """Recent turns verbatim, preceded by the running summary if any."""
+        history = list(self.conversation_history)
+        if self._history_summary:
+            history.insert(0, {
+                "role": "system",
+                "content": f"Summary of the conversation so far: {self._history_summary}"
+            })
+        return history
+
+    async def _maybe_summarize_history(self):
+        """Fold the oldest turns into a running summary once history is long.
+
+        One cheap gpt-4o-mini call replaces twelve verbatim turns, capping
+        the tokens resent every subsequent request. Runs in the background
+        after a reply, so the user never waits on it.
+        """
+        if len(self.conversation_history) <= 24:
+            return
+        old_turns = [self.conversation_history.popleft() for _ in range(12)]
+        transcript = "\n".join(f"{t['role']}: {t['content']}" for t in old_turns)
+        if self._history_summary:
+            transcript = f"Earlier summary: {self._history_summary}\n\n{transcript}"
+        try:
+            response = await self.client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=[
+                    make_message("system", "Summarize this therapy conversation excerpt in a few sentences, preserving emotional context, key facts and any commitments made."),
+                    make_message("user", transcript)
+                ],
+                max_tokens=150
+            )
+            self._history_summary = response.choices[0].message.content.strip()
+        except Exception as e:
+            # The turns are dropped anyway, matching the forgetting the
+            # deque's maxlen would have imposed
+            logger.warning(f"History summarization failed: {e}")
+
+    def _context_hash(self) -> str:
+        """Hash the recent conversation so cache hits respect context."""
+        if not self.conversation_history:
+            return ""
+        recent = list(self.conversation_history)[-4:]
+        return hashlib.md5(json.dumps(recent).encode()).hexdigest()
+
     def _make_warm_and_supportive(self, response: str) -> str:
-        response = response.replace("*", "") 
-        response = response.replace("I suggest", "It might be helpful to try")
-        response = response.replace("I recommend", "Perhaps exploring this could be a great step for you")
-        response = response.replace("You should", "It might feel good to")
+        response = warm_sub(response)
 
-        if "therapy" in response.lower():
+        if THERAPY_PATTERN.search(response):
             response += "\nI'm here to guide you through this process, and you're not alone in it."
 
         return response
@@ -2,6 +2,7 @@ import os
 import io
 import wave
 import queue
+import asyncio
 import numpy as np
 import sounddevice as sd
 from typing import Optional
@@ -11,7 +12,35 @@ import time
 
 load_dotenv()
 
+try:
+    import soundfile as sf
+except ImportError:
+    sf = None  # optional; WAV is used when soundfile is unavailable
+
+try:
+    from numba import njit
+
+    @njit(cache=True, fastmath=True)
+    def _chunk_is_silent(samples, thresh_sq):
+        s = 0.0
+        for i in range(samples.shape[0]):
+            s += samples[i] * samples[i]
+        return s / samples.shape[0] < thresh_sq
+except ImportError:
+    # numba is optional; the NumPy dot product is still allocation-free
+    def _chunk_is_silent(samples, thresh_sq):
+        return float(samples @ samples) / samples.shape[0] < thresh_sq
+
 class VoiceInput:
+    # No per-instance __dict__: the audio path touches these attributes in
+    # every callback, and slot loads are cheaper than dict lookups
+    __slots__ = (
+        'client', 'stt_model', 'sample_rate', 'channels',
+        'silence_threshold', 'silence_duration', 'segment_pause',
+        '_silence_thresh_sq', 'max_samples', '_buf', '_int16_scratch',
+        '_audio_format', '_pos', 'is_recording'
+    )
+
     def __init__(self):
         self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
         self.stt_model = os.getenv("STT_MODEL", "whisper-1")
@@ -23,19 +52,53 @@ class VoiceInput:
         # Silence detection settings
         self.silence_threshold = 0.01   # volume level for silence
         self.silence_duration = 2.0     # stop after 2s of silence
+        self.segment_pause = 0.6        # pause that finalizes a speech segment
+        # Compare mean-square against the squared threshold so the hot
+        # audio callback never needs a sqrt or a temporary array
+        self._silence_thresh_sq = self.silence_threshold ** 2
 
-        self.audio_buffer = []
+        # Preallocated capture buffer (up to 1 minute per turn): writing
+        # slices into float32 storage avoids boxing every sample into a
+        # PyFloat the way list.extend would
+        self.max_samples = self.sample_rate * 60
+        self._buf = np.empty(self.max_samples, dtype=np.float32)
+        self._int16_scratch = np.empty(self.max_samples, dtype=np.int16)
+        # FLAC halves the upload size losslessly for speech; fall back to
+        # WAV when soundfile is not installed
+        self._audio_format = 'flac' if sf is not None else 'wav'
+        self._pos = 0
         self.is_recording = False
 
+        # Warm up the (possibly JIT-compiled) silence check so the first
+        # real audio callback doesn't pay compilation latency
+        _chunk_is_silent(np.zeros(8, dtype=np.float32), self._silence_thresh_sq)
+
     def save_audio_to_bytes(self, audio_data: np.ndarray) -> bytes:
-        """Convert numpy audio array to WAV bytes."""
-        audio_int16 = (audio_data * 32767).astype(np.int16)
+        """Convert numpy audio array to WAV bytes.
+
+        Quantizes in place (the capture buffer is reset per recording) and
+        reuses the preallocated int16 scratch buffer, avoiding the two
+        full-size temporaries that (audio_data * 32767).astype(np.int16)
+        would allocate.
+        """
+        n = audio_data.shape[0]
+        np.multiply(audio_data, 32767.0, out=audio_data)
+        np.rint(audio_data, out=audio_data)
+        self._int16_scratch[:n] = audio_data
+
+        if sf is not None:
+            flac_buffer = io.BytesIO()
+            sf.write(flac_buffer, self._int16_scratch[:n], self.sample_rate,
+                     format='FLAC', subtype='PCM_16')
+            flac_buffer.seek(0)
+            return flac_buffer.read()
+
         wav_buffer = io.BytesIO()
         with wave.open(wav_buffer, "wb") as wav_file:
             wav_file.setnchannels(self.channels)
             wav_file.setsampwidth(2)
             wav_file.setframerate(self.sample_rate)
-            wav_file.writeframes(audio_int16.tobytes())
+            wav_file.writeframesraw(self._int16_scratch[:n].tobytes())
         wav_buffer.seek(0)
         return wav_buffer.read()
 
@@ -43,7 +106,7 @@ class VoiceInput:
         """Send audio to Whisper and get transcription."""
         try:
             audio_file = io.BytesIO(audio_bytes)
-            audio_file.name = "recording.wav"
+            audio_file.name = f"recording.{self._audio_format}"
             response = self.client.audio.transcriptions.create(
                 model=self.stt_model,
                 file=audio_file,
@@ -59,7 +122,7 @@ class VoiceInput:
         """Record voice until silence is detected, then transcribe."""
         print("🎤 Listening... Start speaking. (Auto-stop after silence)")
 
-        self.audio_buffer = []
+        self._pos = 0
         self.is_recording = True
         silence_start = None
 
@@ -70,12 +133,11 @@ class VoiceInput:
 
             # Flatten input to 1D
             samples = indata[:, 0]
-            self.audio_buffer.extend(samples)
+            end = min(self._pos + samples.shape[0], self.max_samples)
+            self._buf[self._pos:end] = samples[:end - self._pos]
+            self._pos = end
 
-            # Check volume (RMS)
-            rms = np.sqrt(np.mean(samples ** 2))
-
-            if rms < self.silence_threshold:
+            if _chunk_is_silent(samples, self._silence_thresh_sq):
                 if silence_start is None:
                     silence_start = time.time()
                 elif time.time() - silence_start > self.silence_duration:
@@ -93,13 +155,104 @@ class VoiceInput:
 
         self.is_recording = False
 
-        if not self.audio_buffer:
+        if self._pos == 0:
             print("⚠️ No audio captured.")
             return None
 
         print("⏹️ Recording stopped. Processing...")
 
-        audio_array = np.array(self.audio_buffer, dtype=np.float32)
+        # Zero-copy view of the captured samples
+        audio_array = self._buf[:self._pos]
         audio_bytes = self.save_audio_to_bytes(audio_array)
 
         return self.speech_to_text(audio_bytes)
+
+    async def record_and_transcribe_async(self) -> Optional[str]:
+        """Record voice until silence, transcribing finished segments
+        while later ones are still being captured.
+
+        Segments are cut at short intra-utterance pauses and shipped to
+        Whisper in the background, so end-to-end wall clock is roughly
+        max(record, transcribe) instead of their sum.
+        """
+        print("🎤 Listening... Start speaking. (Auto-stop after silence)")
+
+        self._pos = 0
+        self.is_recording = True
+        segments: queue.Queue = queue.Queue()
+        state = {"silence_start": None, "segment_start": 0, "stopped": False}
+
+        def callback(indata, frames, time_info, status):
+            if status:
+                print(f"⚠️ Recording error: {status}", flush=True)
+
+            samples = indata[:, 0]
+            end = min(self._pos + samples.shape[0], self.max_samples)
+            self._buf[self._pos:end] = samples[:end - self._pos]
+            self._pos = end
+
+            if _chunk_is_silent(samples, self._silence_thresh_sq):
+                now = time.time()
+                if state["silence_start"] is None:
+                    state["silence_start"] = now
+                    return
+                paused = now - state["silence_start"]
+                if paused > self.silence_duration:
+                    state["stopped"] = True
+                    raise sd.CallbackStop()
+                if paused > self.segment_pause and self._pos > state["segment_start"]:
+                    segments.put((state["segment_start"], self._pos))
+                    state["segment_start"] = self._pos
+            else:
+                state["silence_start"] = None
+
+        def run_stream():
+            with sd.InputStream(callback=callback,
+                                samplerate=self.sample_rate,
+                                channels=self.channels):
+                deadline = time.time() + 60  # allow up to 1 minute per turn
+                while not state["stopped"] and time.time() < deadline:
+                    sd.sleep(50)
+
+        stream_task = asyncio.create_task(asyncio.to_thread(run_stream))
+        stt_tasks = []
+
+        def transcribe_segment(start, end):
+            segment_bytes = self.save_audio_to_bytes(self._buf[start:end].copy())
+            stt_tasks.append(asyncio.create_task(
+                asyncio.to_thread(self.speech_to_text, segment_bytes)
+            ))
+
+        while not stream_task.done():
+            try:
+                start, end = segments.get_nowait()
+            except queue.Empty:
+                await asyncio.sleep(0.05)
+                continue
+            transcribe_segment(start, end)
+
+        await stream_task
+        self.is_recording = False
+
+        # The poll loop exits as soon as the stream task finishes, so a
+        # segment enqueued during its last sleep would be dropped; drain
+        # whatever is left before the tail check (segment_start already
+        # points past queued segments, so the tail can't recover them)
+        while True:
+            try:
+                start, end = segments.get_nowait()
+            except queue.Empty:
+                break
+            transcribe_segment(start, end)
+
+        if self._pos > state["segment_start"]:
+            transcribe_segment(state["segment_start"], self._pos)
+
+        if not stt_tasks:
+            print("⚠️ No audio captured.")
+            return None
+
+        print("⏹️ Recording stopped. Processing...")
+        texts = await asyncio.gather(*stt_tasks)
+        combined = " ".join(t for t in texts if t)
+        return combined or None
@@ -1,8 +1,8 @@
 import os
+import re
 import asyncio
 import logging
 from typing import Dict, Optional
-from datetime import datetime
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -10,12 +10,13 @@ load_dotenv()
 # Import your existing modules
 from finalmain import EmothriveAI
 from prompt import TherapyType, ConversationStyle
-from finalvoice import VoiceInput
-from voiceoutput import VoiceOutput, TherapeuticVoiceManager, SpeechStyle
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Sentence boundary used to flush streamed text to TTS piece by piece
+_SENTENCE_END = re.compile(r'[.!?]\s')
+
 
 class EmothriveAIWithVoice(EmothriveAI):
     """
@@ -49,6 +50,9 @@ class EmothriveAIWithVoice(EmothriveAI):
         
         if enable_voice_output:
             try:
+                # Imported lazily: the TTS stack is heavy and text-only
+                # runs never need it
+                from voiceoutput import VoiceOutput, TherapeuticVoiceManager, SpeechStyle
                 self.voice_output = VoiceOutput(
                     azure_key=azure_tts_key,
                     azure_region=azure_region,
@@ -74,7 +78,9 @@ class EmothriveAIWithVoice(EmothriveAI):
             # Step 1: Get voice input
             if self.voice_input:
                 print("Listening... Press Enter when done speaking.")
-                user_text = self.voice_input.record_and_transcribe()
+                # Recording blocks on PyAudio; run it on a worker thread so
+                # the event loop stays responsive while audio is captured
+                user_text = await asyncio.to_thread(self.voice_input.record_and_transcribe)
                 
                 if not user_text:
                     return {
@@ -89,28 +95,50 @@ class EmothriveAIWithVoice(EmothriveAI):
                     "error": "Voice input not enabled"
                 }
             
-            # Step 2: Process with AI
-            response_data = await self.process_message({"message": user_text})
-            
-            if not response_data.get("success"):
-                return response_data
-            
-            ai_response = response_data["response"]["text"]
-            print(f"AI Response: {ai_response}")
-            
-            # Step 3: Speak response if voice output is enabled
-            if self.enable_voice_output and self.therapeutic_voice_manager:
+            # Steps 2+3 overlap: the reply is streamed and each completed
+            # sentence is handed to TTS immediately, so audio starts after
+            # the first sentence instead of after the full completion
+            speak = self.enable_voice_output and self.therapeutic_voice_manager
+            user_mood = self._detect_user_mood(user_text) if speak else None
+            if speak:
                 print("Speaking response...")
-                
-                # Detect user mood from input (simplified - you could enhance this)
-                user_mood = self._detect_user_mood(user_text)
-                
-                # Speak with appropriate emotion
-                await self.therapeutic_voice_manager.respond_with_voice(
-                    ai_response, 
-                    user_mood=user_mood
-                )
-            
+
+            # Sentences go through a queue drained by a single player task:
+            # pygame.mixer.music is one channel, so concurrent speak calls
+            # would cut each other off and race on synthesis latency. One
+            # sequential consumer keeps playback in sentence order while
+            # the stream keeps filling the queue.
+            sentence_buf = ""
+            pieces = []
+            tts_queue: asyncio.Queue = asyncio.Queue()
+            player = (asyncio.create_task(self._play_sentences(tts_queue, user_mood))
+                      if speak else None)
+            async for chunk in self.process_message_stream({"message": user_text}):
+                pieces.append(chunk)
+                if not speak:
+                    continue
+                sentence_buf += chunk
+                while (match := _SENTENCE_END.search(sentence_buf)):
+                    sentence = sentence_buf[:match.end()].strip()
+                    sentence_buf = sentence_buf[match.end():]
+                    if sentence:
+                        tts_queue.put_nowait(sentence)
+
+            ai_response = "".join(pieces)
+            if not ai_response:
+                if player:
+                    tts_queue.put_nowait(None)
+                    await player
+                return {"success": False, "error": "No response generated"}
+            print(f"AI Response: {ai_response}")
+
+            if player:
+                tail = sentence_buf.strip()
+                if tail:
+                    tts_queue.put_nowait(tail)
+                tts_queue.put_nowait(None)
+                await player
+
             return {
                 "success": True,
                 "user_input": user_text,
@@ -122,20 +150,19 @@ class EmothriveAIWithVoice(EmothriveAI):
             logger.error(f"Error in voice conversation: {e}")
             return {"success": False, "error": str(e)}
     
+    async def _play_sentences(self, queue: asyncio.Queue, user_mood: str) -> None:
+        """Speak queued sentences one at a time until a None sentinel."""
+        while (sentence := await queue.get()) is not None:
+            await self.therapeutic_voice_manager.respond_with_voice(
+                sentence, user_mood=user_mood
+            )
+
     def _detect_user_mood(self, text: str) -> str:
         """Simple mood detection from user text"""
-        text_lower = text.lower()
-        
-        if any(word in text_lower for word in ['sad', 'depressed', 'down', 'unhappy']):
-            return 'sad'
-        elif any(word in text_lower for word in ['anxious', 'worried', 'nervous', 'scared']):
-            return 'anxious'
-        elif any(word in text_lower for word in ['happy', 'good', 'great', 'wonderful']):
-            return 'happy'
-        elif any(word in text_lower for word in ['angry', 'frustrated', 'upset', 'mad']):
-            return 'angry'
-        else:
-            return 'neutral'
+        # Delegates to the shared detector in prompt.py so there is a
+        # single keyword table to maintain; TTS wants a concrete mood
+        mood = self.prompt_manager.detect_user_mood(text)
+        return mood if mood is not None else 'neutral'
     
     async def process_message_with_voice(self, request_data: Dict) -> Dict:
         """
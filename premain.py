@@ -1,14 +1,20 @@
 import os
+import re
+import time
+import random
 import asyncio
 import logging
-from typing import Dict, List, Optional
-from datetime import datetime
-from openai import OpenAI
+import threading
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+import httpx
+from openai import AsyncOpenAI, APIConnectionError, InternalServerError, RateLimitError
 
 from pdf_processor import PDFVectorStore
-from prompt import TherapyType, PromptManager, ConversationStyle
-from finalvoice import VoiceInput
-from voiceoutput import VoiceOutput, SpeechStyle, TherapeuticVoiceManager
+from prompt import TherapyType, PromptManager, ConversationStyle, make_message
+from semantic_cache import SemanticCache, SemanticLRU
+from text_filters import THERAPY_PATTERN, normalize_message, warm_sub
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -16,7 +22,50 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# One bit per enum member: the session records which therapy types came up
+# as a single int instead of a growing hash set
+_THERAPY_BIT = {t: 1 << i for i, t in enumerate(TherapyType)}
+
+# Sentence boundary used to flush streamed text to TTS piece by piece
+_SENTENCE_END = re.compile(r'[.!?]\s')
+
+# Output tokens dominate wall time per request; the cap is deployment-
+# tunable and the stop sequence cuts decoding short if the model starts
+# scripting the user's next turn
+_MAX_TOKENS = int(os.getenv("OPENAI_MAX_TOKENS", "350"))
+_STOP = ["\nUser:"]
+
+def _word_count_lt(text: str, n: int) -> bool:
+    """True if text has fewer than n whitespace-separated words.
+
+    Scans characters with an early exit instead of allocating the list
+    split() would build just to be counted.
+    """
+    words = 0
+    in_word = False
+    for ch in text:
+        if ch.isspace():
+            in_word = False
+        elif not in_word:
+            in_word = True
+            words += 1
+            if words >= n:
+                return False
+    return True
+
 class EmothriveAI:
+    # Quick responses for common queries, built once at class definition
+    # instead of per message
+    _SIMPLE_RESPONSES: Dict[str, str] = {
+        "how are you?": "I'm here and ready to help. How are you feeling today?",
+        "please find me a girlfriend": "Building connections takes time, but I'm here to guide you. How do you feel about trying new social activities?",
+        "what kind of therapy do you suggest?": "I recommend Cognitive Behavioral Therapy (CBT) for building confidence. Would you like to learn more?",
+        "hi": "Hello! How can I support you today?"
+    }
+    # Longer messages can't be canned replies; checking len first skips
+    # the lowercase allocation for long therapy messages
+    _SIMPLE_MAXLEN = max(map(len, _SIMPLE_RESPONSES)) + 8
+
     def __init__(
         self,
         openai_api_key: str,
@@ -24,11 +73,38 @@ class EmothriveAI:
         default_therapy_type: TherapyType = TherapyType.GENERAL,
         model: str = "gpt-4.1-mini",
         enable_crisis_detection: bool = True,
-        enable_voice: bool = True
+        enable_voice: bool = True,
+        max_concurrent_requests: int = 8,
+        history_window: int = 20
     ):
-        self.client = OpenAI(api_key=openai_api_key)
+        # Async client so the event loop stays free during the model call;
+        # the explicit httpx pool avoids the default client's concurrency
+        # ceiling when many sessions are in flight
+        self.client = AsyncOpenAI(
+            api_key=openai_api_key,
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=200,
+                    max_keepalive_connections=100,
+                    # Keep warm connections around between turns so
+                    # consecutive messages skip the TLS+TCP handshake
+                    keepalive_expiry=60.0
+                ),
+                timeout=httpx.Timeout(30.0, connect=3.0)
+            )
+        )
         
         self.pdf_store = PDFVectorStore(folder_path=pdf_folder)
+        # Near-duplicate messages reuse a prior response instead of paying
+        # another OpenAI round trip; embeddings come from the PDF store's
+        # local MiniLM encoder
+        self.semantic_cache = SemanticCache(
+            embed_fn=self.pdf_store.embeddings.embed_query,
+            embedding_dim=384
+        )
+        # Paraphrased follow-ups reuse recently retrieved PDF context
+        # instead of re-running the vector search
+        self._pdf_cache = SemanticLRU(maxsize=256, ttl=300, threshold=0.95)
         self.prompt_manager = PromptManager(
             default_therapy_type=default_therapy_type,
             conversation_style=ConversationStyle.EMPATHETIC
@@ -37,9 +113,22 @@ class EmothriveAI:
         self.model = model
         self.enable_crisis_detection = enable_crisis_detection
         self.enable_voice = enable_voice
+        # Ceiling on simultaneous in-flight completions when one instance
+        # serves many sessions; keeps bursts under the account's RPM caps
+        # instead of letting them all 429 at once
+        self._sem = asyncio.Semaphore(max_concurrent_requests)
         
-        # Voice components
+        # Loading the FAISS index and constructing the voice stack are
+        # independent; overlapping them cuts cold boot to the slower of
+        # the two instead of their sum
+        kb_thread = threading.Thread(target=self._initialize_knowledge_base)
+        kb_thread.start()
+
+        # Voice components; the audio and TTS stacks are imported only
+        # when a session actually enables voice
         if self.enable_voice:
+            from finalvoice import VoiceInput
+            from voiceoutput import VoiceOutput, SpeechStyle, TherapeuticVoiceManager
             self.voice_input = VoiceInput()
             self.voice_output = VoiceOutput(
                 speech_style=SpeechStyle.EMPATHETIC,
@@ -48,15 +137,34 @@ class EmothriveAI:
             self.voice_manager = TherapeuticVoiceManager(self.voice_output)
             self.detected_gender = None
         
-        self.conversation_history: List[Dict] = []
+        # Single dispatch table for canned replies, built once per
+        # instance with normalized keys so "Hi!" still hits; values may be
+        # strings or zero-arg callables so command handlers (e.g. voice
+        # controls) can slot in without new branches
+        self._command_table = {
+            normalize_message(k): v for k, v in self._SIMPLE_RESPONSES.items()
+        }
+
+        # Bounded history: once it grows past 24 turns the oldest 12 are
+        # folded into a running summary, so per-request prompt size stays
+        # capped without forgetting long sessions outright; maxlen is a
+        # backstop in case summarization keeps failing
+        # Ring buffer of the last history_window turns (two dicts per turn):
+        # memory stays bounded per session and the payload sent to the API
+        # is capped without an explicit trim pass
+        self.conversation_history: Deque[Dict] = deque(maxlen=history_window * 2)
+        self._history_summary = ""
         self.session_data = {
-            'session_id': datetime.now().strftime("%Y%m%d_%H%M%S"),
-            'start_time': datetime.now(),
+            # time.time_ns is far cheaper than datetime.strftime (no locale
+            # or tz lookups); durations come from the monotonic clock so
+            # they survive wall-clock adjustments
+            'session_id': f"{time.time_ns():x}",
+            'start_time_mono': time.monotonic(),
             'messages_count': 0,
-            'therapy_types_used': set()
+            'therapy_types_mask': 0
         }
         
-        self._initialize_knowledge_base()
+        kb_thread.join()
         logger.info(f"EmothriveAI initialized with model: {self.model}")
 
     def _initialize_knowledge_base(self):
@@ -84,7 +192,8 @@ class EmothriveAI:
             
         try:
             logger.info("Recording voice input...")
-            transcribed_text = self.voice_input.record_and_transcribe()
+            # Pipelined capture: segments are transcribed while recording
+            transcribed_text = await self.voice_input.record_and_transcribe_async()
             if transcribed_text:
                 logger.info(f"Voice input transcribed: {transcribed_text[:50]}...")
                 return transcribed_text
@@ -112,15 +221,16 @@ class EmothriveAI:
         if self.enable_voice:
             user_mood = self.prompt_manager.detect_user_mood(user_message)
         
-        simple_responses = {
-            "how are you?": "I'm here and ready to help. How are you feeling today?",
-            "please find me a girlfriend": "Building connections takes time, but I'm here to guide you. How do you feel about trying new social activities?",
-            "what kind of therapy do you suggest?": "I recommend Cognitive Behavioral Therapy (CBT) for building confidence. Would you like to learn more?",
-            "hi": "Hello! How can I support you today?"
-        }
-        
-        if user_message.lower() in simple_responses:
-            response_text = simple_responses[user_message.lower()]
+        # Normalize once (and only for messages short enough to possibly
+        # match); punctuation and case no longer defeat canned replies
+        msg_lc = (normalize_message(user_message)
+                  if len(user_message) <= self._SIMPLE_MAXLEN else None)
+        handler = self._command_table.get(msg_lc)
+        if handler is not None:
+            response_text = handler() if callable(handler) else handler
+            # Count early returns too, so the next message's branching sees
+            # a consistent session state
+            self.session_data['messages_count'] += 1
             result = {"success": True, "response": {"text": response_text}}
             
             # Add voice output if enabled
@@ -135,10 +245,11 @@ class EmothriveAI:
             return result
         
         if self.session_data['messages_count'] > 0 and user_message:
-            if len(user_message.split()) < 10:  
+            if _word_count_lt(user_message, 10):
                 response_text = (
                     "It sounds like you're going through something important. Could you share more about how you're feeling or what challenges you're facing? I'm here to help."
                 )
+                self.session_data['messages_count'] += 1
                 result = {"success": True, "response": {"text": response_text}}
                 
                 if self.enable_voice and request_data.get("enable_voice_output", False):
@@ -151,70 +262,238 @@ class EmothriveAI:
                 
                 return result
 
-        # Process with AI
+        # Embed the message exactly once; the same vector feeds the response
+        # cache, the PDF-context cache and the retrieval itself
+        try:
+            query_embedding = await asyncio.to_thread(
+                self.pdf_store.embeddings.embed_query, user_message
+            )
+        except Exception as e:
+            logger.warning(f"Query embedding failed: {e}")
+            query_embedding = None
+
+        # Kick off vector-store retrieval early so it overlaps the response
+        # cache probe; the turn then waits on the slower of the two instead
+        # of their sum
+        # Short turns skip retrieval outright: greetings carry too little
+        # signal to match useful chunks and the embedding + FAISS hop is
+        # the biggest latency item on the pre-model path
+        pdf_task = None
         pdf_context = ""
-        if self.pdf_store and self.pdf_store.vector_store:
-            pdf_context = self.pdf_store.retrieve_pdf_context(user_message)
-        
-        conversation_history = self.conversation_history or []
+        if (self.pdf_store and self.pdf_store.vector_store
+                and not _word_count_lt(user_message, 10)):
+            if query_embedding is not None:
+                pdf_context = self._pdf_cache.get(query_embedding)
+                if pdf_context is None:
+                    pdf_context = ""
+                    pdf_task = asyncio.create_task(asyncio.to_thread(
+                        self.pdf_store.retrieve_pdf_context, user_message,
+                        query_embedding=query_embedding
+                    ))
+            else:
+                pdf_task = asyncio.create_task(asyncio.to_thread(
+                    self.pdf_store.retrieve_pdf_context, user_message
+                ))
+
+        # Semantic cache: skip the OpenAI call for near-duplicate messages
+        cached_response = await asyncio.to_thread(
+            self.semantic_cache.lookup, user_message,
+            query_embedding=query_embedding
+        )
+        if cached_response:
+            if pdf_task:
+                pdf_task.cancel()
+            self.session_data['messages_count'] += 1
+            result = {"success": True, "response": {"text": cached_response}}
+            if self.enable_voice and request_data.get("enable_voice_output", False):
+                try:
+                    await self.voice_manager.respond_with_voice(cached_response, user_mood)
+                    result["response"]["has_voice"] = True
+                except Exception as e:
+                    logger.error(f"Voice output error: {e}")
+                    result["response"]["has_voice"] = False
+            return result
+
+        # Process with AI
+        if pdf_task is not None:
+            pdf_context = await pdf_task
+            if query_embedding is not None:
+                self._pdf_cache.put(query_embedding, pdf_context)
+
+        # Detect once; the result seeds both the prompt and session stats
+        therapy_type = self.prompt_manager.detect_therapy_type(user_message)
 
         messages = self.prompt_manager.create_conversation_messages(
             user_input=user_message,
             pdf_context=pdf_context,
-            conversation_history=conversation_history,
-            is_voice_input=is_voice_input
+            conversation_history=self._history_for_prompt(),
+            is_voice_input=is_voice_input,
+            therapy_type=therapy_type
         )
         
+        speak = self.enable_voice and request_data.get("enable_voice_output", False)
+        has_voice = False
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                max_tokens=350
-            )
-            response_text = response.choices[0].message.content
+            if speak:
+                # Stream so TTS overlaps generation: the user starts hearing
+                # the first sentence while later tokens are still arriving
+                voice_mood = user_mood if user_mood in ['sad', 'anxious', 'happy'] else None
+                stream = await self._call_with_retry(
+                    model=self.model,
+                    messages=messages,
+                    max_tokens=_MAX_TOKENS,
+                    stop=_STOP,
+                    temperature=0.6,
+                    stream=True
+                )
+                # One sequential player drains the queue so sentences play
+                # in order: pygame's music channel is a singleton and
+                # concurrent speak calls would cut each other off
+                pieces: List[str] = []
+                sentence_buf = ""
+                tts_queue: asyncio.Queue = asyncio.Queue()
+                player = asyncio.create_task(
+                    self._play_sentences(tts_queue, voice_mood)
+                )
+                async for chunk in stream:
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if not delta:
+                        continue
+                    pieces.append(delta)
+                    sentence_buf += delta
+                    while (match := _SENTENCE_END.search(sentence_buf)):
+                        sentence = sentence_buf[:match.end()].strip()
+                        sentence_buf = sentence_buf[match.end():]
+                        if sentence:
+                            tts_queue.put_nowait(warm_sub(sentence))
+                tail = sentence_buf.strip()
+                if tail:
+                    tts_queue.put_nowait(warm_sub(tail))
+                tts_queue.put_nowait(None)
+                response_text = "".join(pieces)
+                try:
+                    await player
+                    has_voice = True
+                except Exception as e:
+                    logger.error(f"Voice output error: {e}")
+            else:
+                response = await self._call_with_retry(
+                    model=self.model,
+                    messages=messages,
+                    max_tokens=_MAX_TOKENS,
+                    stop=_STOP,
+                    temperature=0.6
+                )
+                response_text = response.choices[0].message.content
 
             response_text = self._make_warm_and_supportive(response_text)
 
-            self.conversation_history.append({"role": "user", "content": user_message})
-            self.conversation_history.append({"role": "assistant", "content": response_text})
+            self.conversation_history.append(make_message("user", user_message))
+            self.conversation_history.append(make_message("assistant", response_text))
             self.session_data['messages_count'] += 1
+            self.session_data['therapy_types_mask'] |= _THERAPY_BIT[therapy_type]
+            self.semantic_cache.store(
+                user_message, response_text, query_embedding=query_embedding
+            )
+            # Fold old turns into the summary off the critical path
+            asyncio.create_task(self._maybe_summarize_history())
 
             result = {"success": True, "response": {"text": response_text}}
-            
-            # Add voice output if enabled
-            if self.enable_voice and request_data.get("enable_voice_output", False):
-                try:
-                    # Use prompt manager to determine appropriate emotion for response
-                    response_emotion = self.prompt_manager.get_voice_emotion_for_response(response_text)
-                    # Map prompt emotion to voice manager emotion
-                    voice_mood = user_mood if user_mood in ['sad', 'anxious', 'happy'] else None
-                    await self.voice_manager.respond_with_voice(response_text, voice_mood)
-                    result["response"]["has_voice"] = True
-                except Exception as e:
-                    logger.error(f"Voice output error: {e}")
-                    result["response"]["has_voice"] = False
-
+            if speak:
+                result["response"]["has_voice"] = has_voice
             return result
-            
+
         except Exception as e:
             logger.error(f"Error during OpenAI API call: {e}")
             return {"success": False, "error": str(e)}
 
+    async def _play_sentences(self, queue: asyncio.Queue, voice_mood) -> None:
+        """Speak queued sentences one at a time until a None sentinel."""
+        while (sentence := await queue.get()) is not None:
+            await self.voice_manager.respond_with_voice(sentence, voice_mood)
+
+    async def _call_with_retry(self, **kwargs):
+        """Create a chat completion, retrying transient failures.
+
+        The semaphore bounds concurrent in-flight calls; three attempts
+        with capped exponential backoff plus jitter turn the occasional
+        429/5xx/connection blip into a successful turn instead of a lost
+        one. Non-transient errors raise immediately.
+        """
+        async with self._sem:
+            for attempt in range(3):
+                try:
+                    return await self.client.chat.completions.create(**kwargs)
+                except (RateLimitError, APIConnectionError, InternalServerError) as e:
+                    if attempt == 2:
+                        raise
+                    delay = min(8.0, 0.5 * (2 ** attempt)) + random.random() * 0.1
+                    logger.warning(
+                        f"OpenAI call failed ({type(e).__name__}), retrying in {delay:.1f}s"
+                    )
+                    await asyncio.sleep(delay)
+
+    def _history_for_prompt(self) -> List[Dict]:
+        """Recent turns verbatim, preceded by the running summary if any."""
+        history = list(self.conversation_history)
+        if self._history_summary:
+            history.insert(0, {
+                "role": "system",
+                "content": f"Summary of the conversation so far: {self._history_summary}"
+            })
+        return history
+
+    async def _maybe_summarize_history(self):
+        """Fold the oldest turns into a running summary once history is long.
+
+        One cheap gpt-4o-mini call replaces twelve verbatim turns, capping
+        the tokens resent every subsequent request. Runs in the background
+        after a reply, so the user never waits on it.
+        """
+        if len(self.conversation_history) <= 24:
+            return
+        old_turns = [self.conversation_history.popleft() for _ in range(12)]
+        transcript = "\n".join(f"{t['role']}: {t['content']}" for t in old_turns)
+        if self._history_summary:
+            transcript = f"Earlier summary: {self._history_summary}\n\n{transcript}"
+        try:
+            response = await self.client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=[
+                    make_message("system", "Summarize this therapy conversation excerpt in a few sentences, preserving emotional context, key facts and any commitments made."),
+                    make_message("user", transcript)
+                ],
+                max_tokens=150
+            )
+            self._history_summary = response.choices[0].message.content.strip()
+        except Exception as e:
+            # The turns are dropped anyway, matching the forgetting the
+            # deque's maxlen would have imposed
+            logger.warning(f"History summarization failed: {e}")
+
     def _make_warm_and_supportive(self, response: str) -> str:
-        response = response.replace("*", "") 
-        response = response.replace("I suggest", "It might be helpful to try")
-        response = response.replace("I recommend", "Perhaps exploring this could be a great step for you")
-        response = response.replace("You should", "It might feel good to")
+        response = warm_sub(response)
 
-        if "therapy" in response.lower():
+        if THERAPY_PATTERN.search(response):
             response += "\nI'm here to guide you through this process, and you're not alone in it."
 
         return response
 
+    def therapy_types_used(self) -> List[str]:
+        """Decode the session's therapy-type bitmask for display."""
+        mask = self.session_data['therapy_types_mask']
+        return [t.value for t, bit in _THERAPY_BIT.items() if mask & bit]
+
+    async def aclose(self):
+        """Release the OpenAI client's httpx connection pool."""
+        await self.client.close()
+
     def cleanup(self):
         """Cleanup resources"""
         if self.enable_voice:
             self.voice_output.cleanup()
+        # Persist the semantic cache so restarts start warm
+        self.semantic_cache.save()
         logger.info("EmothriveAI cleanup completed")
 
 
@@ -1,7 +1,15 @@
 from typing import Dict, List, Optional
 from enum import Enum
+import functools
 import re
 
+# pyahocorasick scans the message once at C level for every keyword at
+# once; the detectors fall back to plain substring chains without it
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
 class TherapyType(Enum):
     CBT = "Cognitive Behavioral Therapy"
     DBT = "Dialectical Behavior Therapy"
@@ -26,103 +34,213 @@ class ConversationStyle(Enum):
     CURIOUS = "curious"
     SOLUTION_FOCUSED = "solution-focused"
 
+# Keyword tables in priority order: an earlier row wins over a later one
+# no matter where its keyword sits in the text, matching the original
+# if/elif chains. Shared by the automaton and the fallback scans.
+_THERAPY_KEYWORDS = (
+    (("cognitive behavioral therapy", "cbt"), TherapyType.CBT),
+    (("dialectical behavior therapy", "dbt"), TherapyType.DBT),
+    (("acceptance and commitment therapy", "act"), TherapyType.ACT),
+    (("grief", "loss", "bereavement"), TherapyType.GRIEF),
+    (("anxiety", "panic", "worried"), TherapyType.ANXIETY),
+    (("parent", "child", "kid", "family"), TherapyType.PARENTING),
+    (("depress", "sad", "hopeless"), TherapyType.DEPRESSION),
+    (("trauma", "trauma-informed"), TherapyType.TRAUMA),
+)
+_MOOD_KEYWORDS = (
+    (("sad", "depressed", "down", "hopeless", "cry", "crying"), "sad"),
+    (("anxious", "worried", "nervous", "panic", "scared", "afraid"), "anxious"),
+    (("angry", "mad", "frustrated", "furious", "annoyed"), "angry"),
+    (("happy", "good", "great", "wonderful", "excited", "joy"), "happy"),
+)
+# Mood keywords are whole words, never stems: "sadly" is not sad and
+# "download" is not down. (Therapy keywords stay substring matches on
+# purpose — "depress" and "parent" are deliberate stems.) The fallback
+# scan uses one bounded pattern per row to keep the priority order.
+_MOOD_RES = tuple(
+    (re.compile(r"\b(?:%s)\b" % "|".join(map(re.escape, keywords))), mood)
+    for keywords, mood in _MOOD_KEYWORDS
+)
+
+def _build_automaton():
+    if ahocorasick is None:
+        return None
+    # A keyword can belong to several detectors ("sad" is both a therapy
+    # and a mood cue), so each word carries every (category, rank, result,
+    # length); the length lets mood hits be checked for word boundaries
+    entries: Dict[str, list] = {}
+    for category, table in (("therapy", _THERAPY_KEYWORDS), ("mood", _MOOD_KEYWORDS)):
+        for rank, (keywords, result) in enumerate(table):
+            for keyword in keywords:
+                entries.setdefault(keyword, []).append(
+                    (category, rank, result, len(keyword))
+                )
+    automaton = ahocorasick.Automaton()
+    for keyword, values in entries.items():
+        automaton.add_word(keyword, tuple(values))
+    automaton.make_automaton()
+    return automaton
+
+_KEYWORD_AUTOMATON = _build_automaton()
+
+# Plain dict lookup beats the enum's .value descriptor on the per-turn
+# path, and the prompt cache keys on the resulting interned string
+_THERAPY_VALUE = {t: t.value for t in TherapyType}
+
+def make_message(role: str, content: str) -> Dict[str, str]:
+    """Build a chat message dict with the canonical {role, content} shape.
+
+    Every history entry in the process comes through here (or the
+    literals in this module), so all message dicts share one insertion
+    order; the key and role strings are identifier-like literals that
+    CPython interns at compile time, so the SDK's encoder compares them
+    by pointer on the hot path.
+    """
+    return {"role": role, "content": content}
+
+@functools.lru_cache(maxsize=32)
+def _render_system_prompt(therapy_value: str, is_voice_input: bool) -> str:
+    """Render (once per key) the static system prompt for a therapy type.
+
+    There are at most 2 x len(TherapyType) distinct prompts, so every call
+    after the first returns the same interned string — which also keeps
+    the bytes the OpenAI SDK serializes identical across turns.
+    """
+    base_prompt = f"""
+        You are an experienced AI therapist specializing in {therapy_value}.
+        Respond with therapeutic insights and techniques, always keeping the user's wellbeing in focus.
+        """
+
+    if is_voice_input:
+        base_prompt += """
+
+        VOICE INTERACTION GUIDELINES:
+        - The user is speaking to you directly, so be extra warm and conversational
+        - Keep responses natural and flowing for spoken conversation
+        - Use shorter sentences that are easier to understand when heard
+        - Add natural conversational markers like "I hear you" or "That makes sense"
+        - Avoid complex terminology that might be hard to follow in audio
+        - Be more empathetic and personal in your tone since voice feels more intimate
+        """
+
+    return base_prompt.strip()
+
+def _is_word_hit(text: str, end: int, length: int) -> bool:
+    """True if the automaton hit ending at end is a whole word in text."""
+    start = end - length + 1
+    if start > 0 and (text[start - 1].isalnum() or text[start - 1] == "_"):
+        return False
+    after = end + 1
+    return after >= len(text) or not (text[after].isalnum() or text[after] == "_")
+
+
+def _automaton_match(text: str, category: str, table, word_bounded: bool = False):
+    """Best-priority match for category in text, or None.
+
+    With word_bounded, hits inside larger words are discarded so the
+    automaton agrees with the \\b-anchored fallback patterns.
+    """
+    best_rank, best = len(table), None
+    for end, values in _KEYWORD_AUTOMATON.iter(text):
+        for value_category, rank, result, length in values:
+            if value_category != category or rank >= best_rank:
+                continue
+            if word_bounded and not _is_word_hit(text, end, length):
+                continue
+            best_rank, best = rank, result
+    return best
+
 class PromptManager:
     def __init__(self, 
                  default_therapy_type: TherapyType = TherapyType.GENERAL,
                  conversation_style: ConversationStyle = ConversationStyle.EMPATHETIC):
         self.default_therapy_type = default_therapy_type
         self.conversation_style = conversation_style
+        # Rendered system-message dicts keyed by (therapy_type, voice flag):
+        # the prompt text is static per key, so each turn reuses one object
+        # instead of re-rendering and re-allocating the prefix
+        self._prefix_cache: Dict[tuple, Dict[str, str]] = {}
 
     def detect_therapy_type(self, user_input: str) -> TherapyType:
         text = user_input.lower()
-        if any(k in text for k in ["cognitive behavioral therapy", "cbt"]):
-            return TherapyType.CBT
-        if any(k in text for k in ["dialectical behavior therapy", "dbt"]):
-            return TherapyType.DBT
-        if any(k in text for k in ["acceptance and commitment therapy", "act"]):
-            return TherapyType.ACT
-        if any(k in text for k in ["grief", "loss", "bereavement"]):
-            return TherapyType.GRIEF
-        if any(k in text for k in ["anxiety", "panic", "worried"]):
-            return TherapyType.ANXIETY
-        if any(k in text for k in ["parent", "child", "kid", "family"]):
-            return TherapyType.PARENTING
-        if any(k in text for k in ["depress", "sad", "hopeless"]):
-            return TherapyType.DEPRESSION
-        if any(k in text for k in ["trauma", "trauma-informed"]):
-            return TherapyType.TRAUMA
+        if _KEYWORD_AUTOMATON is not None:
+            match = _automaton_match(text, "therapy", _THERAPY_KEYWORDS)
+            return match if match is not None else self.default_therapy_type
+        for keywords, therapy_type in _THERAPY_KEYWORDS:
+            if any(k in text for k in keywords):
+                return therapy_type
         return self.default_therapy_type
 
     def detect_user_mood(self, user_input: str) -> Optional[str]:
         """Detect user's emotional state for voice adaptation"""
         text = user_input.lower()
-        
-        mood_indicators = {
-            'sad': ['sad', 'depressed', 'down', 'hopeless', 'cry', 'crying'],
-            'anxious': ['anxious', 'worried', 'nervous', 'panic', 'scared', 'afraid'],
-            'angry': ['angry', 'mad', 'frustrated', 'furious', 'annoyed'],
-            'happy': ['happy', 'good', 'great', 'wonderful', 'excited', 'joy']
-        }
-        
-        for mood, indicators in mood_indicators.items():
-            if any(indicator in text for indicator in indicators):
+        if _KEYWORD_AUTOMATON is not None:
+            return _automaton_match(text, "mood", _MOOD_KEYWORDS, word_bounded=True)
+        for pattern, mood in _MOOD_RES:
+            if pattern.search(text):
                 return mood
-        
         return None
 
    
 
-    def generate_system_prompt(self, therapy_type: TherapyType, pdf_context: str = "", is_voice_input: bool = False) -> str:
-        base_prompt = f"""
-        You are an experienced AI therapist specializing in {therapy_type.value}. 
-        Use the following clinical knowledge extracted from documents to inform your responses when relevant:
-        {pdf_context}
-        Respond with therapeutic insights and techniques, always keeping the user's wellbeing in focus.
-        """
-        
-        if is_voice_input:
-            voice_addition = """
-        
-        VOICE INTERACTION GUIDELINES:
-        - The user is speaking to you directly, so be extra warm and conversational
-        - Keep responses natural and flowing for spoken conversation
-        - Use shorter sentences that are easier to understand when heard
-        - Add natural conversational markers like "I hear you" or "That makes sense"
-        - Avoid complex terminology that might be hard to follow in audio
-        - Be more empathetic and personal in your tone since voice feels more intimate
-        """
-            base_prompt += voice_addition
-        
-        return base_prompt.strip()
+    def generate_system_prompt(self, therapy_type: TherapyType, is_voice_input: bool = False) -> str:
+        # Deliberately static per (therapy_type, is_voice_input): the retrieved
+        # PDF context travels at the tail of the user turn so this prefix stays
+        # byte-identical across turns and OpenAI's prompt caching can hit on it
+        return _render_system_prompt(_THERAPY_VALUE[therapy_type], is_voice_input)
 
-    def create_conversation_messages(self, 
-                                   user_input: str, 
-                                   pdf_context: str = "", 
+    def create_conversation_messages(self,
+                                   user_input: str,
+                                   pdf_context: str = "",
                                    conversation_history: List[Dict] = None,
-                                   is_voice_input: bool = False) -> List[Dict]:
-        therapy_type = self.detect_therapy_type(user_input)
-        system_prompt = self.generate_system_prompt(therapy_type, pdf_context, is_voice_input)
-        messages = [{"role": "system", "content": system_prompt}]
-        
+                                   is_voice_input: bool = False,
+                                   therapy_type: Optional[TherapyType] = None) -> List[Dict]:
+        # Callers that already detected the therapy type (e.g. for session
+        # stats) pass it in so the message isn't scanned a second time
+        if therapy_type is None:
+            therapy_type = self.detect_therapy_type(user_input)
+        key = (therapy_type, is_voice_input)
+        prefix = self._prefix_cache.get(key)
+        if prefix is None:
+            prefix = {
+                "role": "system",
+                "content": self.generate_system_prompt(therapy_type, is_voice_input)
+            }
+            self._prefix_cache[key] = prefix
+        messages = [prefix]
+
         if conversation_history:
             messages.extend(conversation_history)
-        
+
+        # Retrieved knowledge rides at the tail of the user turn: the prompt
+        # prefix (static system message + history) stays byte-identical turn
+        # over turn, so server-side prefix caching keeps working even though
+        # the retrieved context changes with every message
+        if pdf_context:
+            user_input = (
+                f"{user_input}\n\n"
+                "Clinical knowledge extracted from documents; use when relevant:\n"
+                f"{pdf_context}"
+            )
         messages.append({"role": "user", "content": user_input})
-        
+
         return messages
 
+    # One compiled pattern per emotion, in priority order; each replaces
+    # four separate substring scans of the response
+    _EMOTION_PATTERNS = (
+        (re.compile(r"sorry|difficult|hard|challenging"), 'empathetic'),
+        (re.compile(r"great|wonderful|proud|progress"), 'friendly'),
+        (re.compile(r"calm|relax|gentle|peaceful"), 'gentle'),
+    )
+
     def get_voice_emotion_for_response(self, response_text: str) -> str:
         """Determine appropriate voice emotion based on response content"""
         text_lower = response_text.lower()
-        
-        if any(word in text_lower for word in ['sorry', 'difficult', 'hard', 'challenging']):
-            return 'empathetic'
-        elif any(word in text_lower for word in ['great', 'wonderful', 'proud', 'progress']):
-            return 'friendly'
-        elif any(word in text_lower for word in ['calm', 'relax', 'gentle', 'peaceful']):
-            return 'gentle'
-        else:
-            return 'empathetic'
+        for pattern, emotion in self._EMOTION_PATTERNS:
+            if pattern.search(text_lower):
+                return emotion
+        return 'empathetic'
 
     def ensure_response_length(self, response: str) -> str:
         return response
\ No newline at end of file
@@ -0,0 +1,382 @@
+import os
+import json
+import time
+import atexit
+import hashlib
+import logging
+import weakref
+from collections import OrderedDict, defaultdict, deque
+from typing import Any, Callable, List, Optional, Tuple
+
+import numpy as np
+import faiss
+from openai import OpenAI
+
+# orjson parses/serializes the persisted cache several times faster than
+# stdlib json; fall back silently when it isn't installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# numba JIT-compiles the similarity scan over cached query vectors into
+# vectorized machine code; NumPy handles it fine when it isn't installed
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
+
+if njit is not None:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _similarity_scores(matrix, query):
+        out = np.empty(matrix.shape[0], dtype=np.float32)
+        for i in prange(matrix.shape[0]):
+            acc = np.float32(0.0)
+            for j in range(matrix.shape[1]):
+                acc += matrix[i, j] * query[j]
+            out[i] = acc
+        return out
+else:
+    def _similarity_scores(matrix, query):
+        return matrix @ query
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class EmbeddingCache:
+    """Cache in front of a text-embedding function.
+
+    The first layer is an exact-match LRU keyed by a digest of the
+    normalized text, so repeated phrasings skip the encoder entirely. On a
+    miss the freshly computed vector is bucketed by random-projection LSH
+    (16 hyperplanes); when a stored vector in the same bucket matches at
+    above the reuse threshold, that canonical vector is returned instead,
+    deduplicating near-identical embeddings across phrasings.
+
+    Both layers are bounded: the exact layer is an LRU and the bucketed
+    vectors share a FIFO cap of maxsize, so a process-lifetime cache (one
+    engine per process) cannot grow with every distinct message seen.
+    """
+
+    def __init__(self, embed_fn: Callable[[str], List[float]],
+                 maxsize: int = 2048, planes: int = 16,
+                 reuse_threshold: float = 0.97, seed: int = 0):
+        self.embed_fn = embed_fn
+        self.maxsize = maxsize
+        self.reuse_threshold = reuse_threshold
+        self._exact: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._planes = planes
+        # Built lazily once the embedding dimension is known
+        self._projection: Optional[np.ndarray] = None
+        self._buckets = defaultdict(list)
+        # Insertion order of bucketed vectors, for FIFO eviction: without
+        # it every distinct message leaves a vector behind forever
+        self._bucket_fifo: deque = deque()
+        self._rng = np.random.default_rng(seed)
+
+    def _bucket_key(self, unit: np.ndarray) -> int:
+        if self._projection is None:
+            self._projection = self._rng.standard_normal(
+                (unit.shape[0], self._planes)
+            ).astype(np.float32)
+        key = 0
+        for bit in unit @ self._projection > 0.0:
+            key = (key << 1) | int(bit)
+        return key
+
+    def get_or_embed(self, text: str) -> np.ndarray:
+        digest = hashlib.sha1(" ".join(text.lower().split()).encode()).hexdigest()
+        hit = self._exact.get(digest)
+        if hit is not None:
+            self._exact.move_to_end(digest)
+            return hit
+
+        vector = np.asarray(self.embed_fn(text), dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        unit = vector / norm if norm else vector
+        key = self._bucket_key(unit)
+        bucket = self._buckets[key]
+        for candidate in bucket:
+            cand_norm = float(np.linalg.norm(candidate))
+            if cand_norm and float(candidate @ unit) / cand_norm > self.reuse_threshold:
+                vector = candidate
+                break
+        else:
+            bucket.append(vector)
+            self._bucket_fifo.append((key, vector))
+            if len(self._bucket_fifo) > self.maxsize:
+                self._evict_bucketed()
+
+        self._exact[digest] = vector
+        if len(self._exact) > self.maxsize:
+            self._exact.popitem(last=False)
+        return vector
+
+    def _evict_bucketed(self):
+        """Drop the oldest bucketed vector; it only loses dedup candidacy.
+
+        Removal is by identity — near-duplicate vectors in a bucket can
+        compare ambiguously under ==, and the evictee may still be shared
+        by live exact-layer entries.
+        """
+        old_key, old_vector = self._bucket_fifo.popleft()
+        bucket = self._buckets[old_key]
+        for i, candidate in enumerate(bucket):
+            if candidate is old_vector:
+                del bucket[i]
+                break
+        if not bucket:
+            del self._buckets[old_key]
+
+
+class SemanticLRU:
+    """Small in-memory LRU keyed by embedding similarity, with a TTL.
+
+    Unlike SemanticCache this holds arbitrary values (e.g. retrieved PDF
+    context) and is bounded: the least recently used entry is evicted at
+    maxsize, and entries older than ttl seconds are dropped on access.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 300.0,
+                 threshold: float = 0.95):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.threshold = threshold
+        # Parallel lists ordered oldest-to-newest; vectors are normalized 1-D
+        self._vectors: List[np.ndarray] = []
+        self._entries: List[Tuple[Any, float]] = []
+        # Contiguous (K, d) copy of _vectors for the similarity scan,
+        # rebuilt lazily after any mutation
+        self._matrix: Optional[np.ndarray] = None
+
+    def get(self, embedding) -> Optional[Any]:
+        if not self._entries:
+            return None
+        vector = SemanticCache._as_normalized(embedding)[0]
+        if self._matrix is None:
+            self._matrix = np.stack(self._vectors)
+        scores = _similarity_scores(self._matrix, vector)
+        best = int(np.argmax(scores))
+        if float(scores[best]) < self.threshold:
+            return None
+        value, stamp = self._entries[best]
+        if time.monotonic() - stamp > self.ttl:
+            del self._vectors[best]
+            del self._entries[best]
+            self._matrix = None
+            return None
+        # Refresh recency by moving the hit to the newest position
+        self._vectors.append(self._vectors.pop(best))
+        self._entries.append(self._entries.pop(best))
+        self._matrix = None
+        return value
+
+    def put(self, embedding, value: Any):
+        if len(self._entries) >= self.maxsize:
+            del self._vectors[0]
+            del self._entries[0]
+        self._vectors.append(SemanticCache._as_normalized(embedding)[0])
+        self._entries.append((value, time.monotonic()))
+        self._matrix = None
+
+
+# Exit-time persistence: one weak reference per cache path. A bound-method
+# atexit.register(cache.save) would pin the cache — and the engine holding
+# it — for the process lifetime, and every engine sharing a path would
+# rewrite the same files at exit, clobbering each other.
+_exit_saves: dict = {}
+
+
+def _save_registered_caches():
+    for ref in _exit_saves.values():
+        cache = ref()
+        if cache is not None:
+            cache.save()
+
+
+def register_exit_save(cache: "SemanticCache") -> None:
+    """Persist cache when the process exits, once per cache path.
+
+    Weak references keep registered caches collectable; the most recently
+    registered cache for a path is the one saved, matching which instance
+    would have won the write anyway.
+    """
+    if not _exit_saves:
+        atexit.register(_save_registered_caches)
+    _exit_saves[os.path.abspath(cache.cache_path)] = weakref.ref(cache)
+
+
+class SemanticCache:
+    """Semantic similarity cache for chat responses.
+
+    Embeds each user message and returns a previously generated response
+    when a new query is close enough (cosine similarity) to a cached one,
+    skipping the OpenAI chat round-trip entirely on hits.
+    """
+
+    def __init__(
+        self,
+        client: Optional[OpenAI] = None,
+        embedding_model: str = "text-embedding-3-small",
+        embedding_dim: int = 1536,
+        similarity_threshold: float = 0.92,
+        cache_path: str = "./semantic_cache/",
+        embed_fn: Optional[Callable[[str], List[float]]] = None,
+        capacity: int = 512
+    ):
+        self.client = client
+        self.embedding_model = embedding_model
+        # When provided, embed_fn (e.g. the PDF store's local MiniLM
+        # embed_query) replaces the OpenAI embeddings API so one embedding
+        # can be shared with retrieval
+        self.embed_fn = embed_fn
+        self.embedding_dim = embedding_dim
+        self.similarity_threshold = similarity_threshold
+        self.cache_path = cache_path
+        self.capacity = capacity
+
+        self.index = faiss.IndexFlatIP(embedding_dim)
+        # Parallel to the index rows: (response_text, conversation_context_hash)
+        self.entries: List[Tuple[str, str]] = []
+        # Last-hit timestamps parallel to entries, for LRU eviction
+        self._last_used: List[float] = []
+
+        # Embedding of the last missed query, reused by store() to avoid
+        # embedding the same message twice.
+        self._pending_query: Optional[str] = None
+        self._pending_embedding: Optional[np.ndarray] = None
+
+        os.makedirs(cache_path, exist_ok=True)
+        self.load()
+
+    @staticmethod
+    def _as_normalized(vector) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32).reshape(1, -1)
+        faiss.normalize_L2(array)
+        return array
+
+    def _embed(self, text: str) -> Optional[np.ndarray]:
+        try:
+            if self.embed_fn is not None:
+                return self._as_normalized(self.embed_fn(text))
+            response = self.client.embeddings.create(
+                model=self.embedding_model,
+                input=text
+            )
+            return self._as_normalized(response.data[0].embedding)
+        except Exception as e:
+            logger.warning(f"Embedding failed, skipping semantic cache: {e}")
+            return None
+
+    def lookup(self, query: str, context_hash: str = "",
+               query_embedding=None) -> Optional[str]:
+        """Return a cached response for a semantically similar query, or None.
+
+        Pass query_embedding to reuse a vector computed elsewhere (e.g. for
+        PDF retrieval) instead of embedding the message a second time.
+        """
+        if query_embedding is not None:
+            embedding = self._as_normalized(query_embedding)
+        else:
+            embedding = self._embed(query)
+        if embedding is None:
+            return None
+
+        self._pending_query = query
+        self._pending_embedding = embedding
+
+        if self.index.ntotal == 0:
+            return None
+
+        scores, indices = self.index.search(embedding, 1)
+        score, idx = float(scores[0][0]), int(indices[0][0])
+        if idx < 0 or score < self.similarity_threshold:
+            return None
+
+        response_text, cached_context_hash = self.entries[idx]
+        if cached_context_hash != context_hash:
+            return None
+
+        self._last_used[idx] = time.monotonic()
+        logger.info(f"Semantic cache hit (score={score:.3f})")
+        return response_text
+
+    def _evict_lru(self):
+        """Drop the least recently used entry, rebuilding the flat index.
+
+        A rebuild copies capacity x dim float32s — sub-millisecond at the
+        default sizes — and only runs once per store beyond capacity.
+        """
+        victim = min(range(len(self.entries)), key=self._last_used.__getitem__)
+        matrix = self.index.reconstruct_n(0, self.index.ntotal)
+        self.index = faiss.IndexFlatIP(self.embedding_dim)
+        self.index.add(np.delete(matrix, victim, axis=0))
+        del self.entries[victim]
+        del self._last_used[victim]
+
+    def store(self, query: str, response_text: str, context_hash: str = "",
+              query_embedding=None):
+        """Cache a generated response, reusing the embedding from lookup()."""
+        if query_embedding is not None:
+            embedding = self._as_normalized(query_embedding)
+        elif self._pending_query == query and self._pending_embedding is not None:
+            embedding = self._pending_embedding
+        else:
+            embedding = self._embed(query)
+        self._pending_query = None
+        self._pending_embedding = None
+
+        if embedding is None:
+            return
+
+        if len(self.entries) >= self.capacity:
+            self._evict_lru()
+        self.index.add(embedding)
+        self.entries.append((response_text, context_hash))
+        self._last_used.append(time.monotonic())
+
+    def save(self):
+        try:
+            faiss.write_index(self.index, os.path.join(self.cache_path, "queries.index"))
+            entries_file = os.path.join(self.cache_path, "entries.json")
+            if orjson is not None:
+                with open(entries_file, "wb") as f:
+                    f.write(orjson.dumps(self.entries))
+            else:
+                with open(entries_file, "w") as f:
+                    json.dump(self.entries, f)
+            logger.info(f"Semantic cache saved ({self.index.ntotal} entries)")
+        except Exception as e:
+            logger.error(f"Failed to save semantic cache: {e}")
+
+    def load(self) -> bool:
+        index_file = os.path.join(self.cache_path, "queries.index")
+        entries_file = os.path.join(self.cache_path, "entries.json")
+        if not (os.path.exists(index_file) and os.path.exists(entries_file)):
+            return False
+        try:
+            index = faiss.read_index(index_file)
+            if index.d != self.embedding_dim:
+                logger.warning(
+                    f"Discarding persisted cache: dimension {index.d} != {self.embedding_dim}"
+                )
+                return False
+            self.index = index
+            if orjson is not None:
+                with open(entries_file, "rb") as f:
+                    raw_entries = orjson.loads(f.read())
+            else:
+                with open(entries_file) as f:
+                    raw_entries = json.load(f)
+            self.entries = [tuple(entry) for entry in raw_entries]
+            # Recency isn't persisted; treat everything as equally fresh
+            self._last_used = [time.monotonic()] * len(self.entries)
+            logger.info(f"Semantic cache loaded ({self.index.ntotal} entries)")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to load semantic cache: {e}")
+            self.index = faiss.IndexFlatIP(self.embedding_dim)
+            self.entries = []
+            self._last_used = []
+            return False
@@ -0,0 +1,59 @@
+"""Shared response post-processing tables for the engine variants.
+
+All three engines apply the same warm-tone rewrite to model output; the
+substitution map and its precompiled alternation live here so the pattern
+is compiled exactly once per process and the tables cannot drift apart.
+"""
+import re
+import string
+
+# Strips every ASCII punctuation character in one C-level pass
+_PUNCT_TBL = str.maketrans("", "", string.punctuation)
+
+
+def normalize_message(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace.
+
+    Used to key canned-reply tables so "Hi!", "hi" and " HI " all land on
+    the same entry and skip the model call.
+    """
+    return " ".join(text.lower().translate(_PUNCT_TBL).split())
+
+# Warm-tone substitutions applied to every response, compiled once so the
+# text is scanned in a single pass instead of once per replacement.
+# Asterisks are stripped separately via str.translate — a C-level pass —
+# rather than carrying a single-char branch through the regex callback.
+_STRIP = str.maketrans('', '', '*')
+_WARM_SUBS = {
+    "I suggest": "It might be helpful to try",
+    "I recommend": "Perhaps exploring this could be a great step for you",
+    "You should": "It might feel good to"
+}
+_WARM_PATTERN = re.compile("|".join(re.escape(k) for k in _WARM_SUBS))
+
+# Streaming emitters keep at least this many characters buffered so a
+# pattern still arriving at the end of the stream is never split.
+WARM_TAIL = max(map(len, _WARM_SUBS))
+# First words of the patterns: a streaming cut placed right after one of
+# these would land on the pattern's internal space and split it. The word
+# may follow any non-word character (newline, quote, parenthesis, ...) or
+# the start of the text, not just a space, so the unsafe-cut check is a
+# $-anchored regex rather than a space-delimited slice compare.
+_WARM_FIRST_WORDS = frozenset(k.split(" ", 1)[0] for k in _WARM_SUBS)
+WARM_CUT_UNSAFE = re.compile(
+    r"(?:^|\W)(?:%s)$" % "|".join(map(re.escape, sorted(_WARM_FIRST_WORDS)))
+)
+# Window the unsafe-cut search needs: longest first word plus one
+# boundary character before it.
+WARM_CUT_WINDOW = max(map(len, _WARM_FIRST_WORDS)) + 1
+# Matches only "therapy", like the original `"therapy" in response.lower()`
+# check, minus the per-response lowercased copy. Word-bounded so e.g.
+# "aromatherapy" does not trigger the follow-up suffix.
+THERAPY_PATTERN = re.compile(r"\btherapy\b", re.IGNORECASE)
+
+
+def warm_sub(text: str) -> str:
+    """Apply the warm-tone substitutions in a single pass over text."""
+    return _WARM_PATTERN.sub(
+        lambda m: _WARM_SUBS[m.group(0)], text.translate(_STRIP)
+    )
@@ -12,7 +12,21 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv()
 
+try:
+    import soundfile as sf
+except ImportError:
+    sf = None  # optional; WAV is used when soundfile is unavailable
+
+
 class VoiceInput:
+    # No per-instance __dict__: the audio path touches these attributes in
+    # every callback, and slot loads are cheaper than dict lookups
+    __slots__ = (
+        'client', 'stt_model', 'sample_rate', 'channels', 'chunk_duration',
+        'min_recording_duration', 'is_recording', 'max_samples', '_buf',
+        '_int16_scratch', '_audio_format', '_pos'
+    )
+
     def __init__(self):
         """Initialize the voice chatbot with OpenAI client and audio settings."""
         self.client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
@@ -27,7 +41,16 @@ class VoiceInput:
         
         # Recording state
         self.is_recording = False
-        self.audio_buffer = []
+        # Preallocated capture buffer (up to 1 minute): slice assignment
+        # into float32 storage avoids boxing every sample into a PyFloat
+        # the way list.extend would
+        self.max_samples = int(self.sample_rate * 60)
+        self._buf = np.empty(self.max_samples, dtype=np.float32)
+        self._int16_scratch = np.empty(self.max_samples, dtype=np.int16)
+        # FLAC halves the upload size losslessly for speech; fall back to
+        # WAV when soundfile is not installed
+        self._audio_format = 'flac' if sf is not None else 'wav'
+        self._pos = 0
        
         
         print("🎤 Voice Chatbot initialized!")
@@ -41,12 +64,15 @@ class VoiceInput:
     def audio_callback(self, indata, frames, time, status):
         """Callback function for audio input."""
         if self.is_recording:
-            self.audio_buffer.extend(indata[:, 0])
+            samples = indata[:, 0]
+            end = min(self._pos + samples.shape[0], self.max_samples)
+            self._buf[self._pos:end] = samples[:end - self._pos]
+            self._pos = end
 
     def start_recording(self):
         """Start recording audio from microphone."""
         self.is_recording = True
-        self.audio_buffer = []
+        self._pos = 0
         print("🔴 Recording... Press ENTER to stop")
         
         with sd.InputStream(callback=self.audio_callback, 
@@ -58,18 +84,33 @@ class VoiceInput:
         print("⏹️ Recording stopped")
 
     def save_audio_to_bytes(self, audio_data: np.ndarray) -> bytes:
-        """Convert numpy audio data to WAV bytes."""
-        # Convert float32 to int16
-        audio_int16 = (audio_data * 32767).astype(np.int16)
-        
+        """Convert numpy audio data to WAV bytes.
+
+        Quantizes in place (the capture buffer is reset per recording) and
+        reuses the preallocated int16 scratch buffer, avoiding the two
+        full-size temporaries that (audio_data * 32767).astype(np.int16)
+        would allocate.
+        """
+        n = audio_data.shape[0]
+        np.multiply(audio_data, 32767.0, out=audio_data)
+        np.rint(audio_data, out=audio_data)
+        self._int16_scratch[:n] = audio_data
+
+        if sf is not None:
+            flac_buffer = io.BytesIO()
+            sf.write(flac_buffer, self._int16_scratch[:n], self.sample_rate,
+                     format='FLAC', subtype='PCM_16')
+            flac_buffer.seek(0)
+            return flac_buffer.read()
+
         # Create WAV file in memory
         wav_buffer = io.BytesIO()
         with wave.open(wav_buffer, 'wb') as wav_file:
             wav_file.setnchannels(self.channels)
             wav_file.setsampwidth(2)  # 2 bytes for int16
             wav_file.setframerate(self.sample_rate)
-            wav_file.writeframes(audio_int16.tobytes())
-        
+            wav_file.writeframesraw(self._int16_scratch[:n].tobytes())
+
         wav_buffer.seek(0)
         return wav_buffer.read()
 
@@ -78,7 +119,7 @@ class VoiceInput:
         try:
             # Create a file-like object from bytes
             audio_file = io.BytesIO(audio_bytes)
-            audio_file.name = "recording.wav"  # Whisper needs a filename
+            audio_file.name = f"recording.{self._audio_format}"  # Whisper needs a filename
             
             print("🔄 Converting speech to text...")
             response = self.client.audio.transcriptions.create(
@@ -95,20 +136,20 @@ class VoiceInput:
 
     def get_voice_input(self) -> Optional[str]:
         """Record voice input and convert to text."""
-        if not self.audio_buffer:
+        if self._pos == 0:
             print("❌ No audio recorded")
             return None
-        
+
         # Check if recording is long enough
-        recording_duration = len(self.audio_buffer) / self.sample_rate
+        recording_duration = self._pos / self.sample_rate
         if recording_duration < self.min_recording_duration:
             print(f"❌ Recording too short ({recording_duration:.1f}s). Minimum is {self.min_recording_duration}s")
             return None
         
         print(f"🔊 Processing {recording_duration:.1f} seconds of audio...")
-        
-        # Convert audio to bytes
-        audio_array = np.array(self.audio_buffer, dtype=np.float32)
+
+        # Zero-copy view of the captured samples
+        audio_array = self._buf[:self._pos]
         audio_bytes = self.save_audio_to_bytes(audio_array)
         
         # Speech to text
@@ -127,5 +168,9 @@ class VoiceInput:
     # In voice.py, add noise reduction and better audio validation
     def validate_audio_quality(self, audio_data: np.ndarray) -> bool:
         """Check if audio has sufficient signal."""
-        rms = np.sqrt(np.mean(audio_data ** 2))
-        return rms > 0.01  # Adjust threshold as needed
\ No newline at end of file
+        if audio_data.size == 0:
+            return False
+        # Mean-square against the squared threshold: no sqrt, and the dot
+        # product avoids the temporary array audio_data ** 2 would create
+        mean_sq = float(audio_data @ audio_data) / audio_data.size
+        return mean_sq > 0.01 ** 2  # Adjust threshold as needed
\ No newline at end of file
@@ -4,6 +4,7 @@ import pyaudio
 import wave
 import threading
 import io
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import time
 from typing import Optional, Callable
@@ -39,6 +40,11 @@ class RealTimeVoiceInput:
         # Data
         self.frames = []
         self.silence_count = 0
+
+        # Bounded worker pool for transcription: utterances are processed
+        # off the record loop (capture keeps running during the Whisper
+        # call) without spawning an unbounded thread per utterance
+        self._process_executor = ThreadPoolExecutor(max_workers=2)
         
         # Simple callbacks (no Streamlit state access)
         self.transcript_callback = None
@@ -107,31 +113,31 @@ class RealTimeVoiceInput:
                             
                             # Process if enough silence
                             if self.silence_count >= self.silence_frames and len(self.frames) > 10:
-                                logger.info(f"Processing {len(self.frames)} frames")
-                                self._process_audio()
-                                
+                                logger.info("Processing %d frames", len(self.frames))
+                                frames, self.frames = self.frames, []
+                                self._process_executor.submit(self._process_audio, frames)
+
                                 # Reset
-                                self.frames = []
                                 self.silence_count = 0
                                 speech_started = False
 
                 except Exception as e:
-                    logger.error(f"Recording error: {e}")
+                    logger.error("Recording error: %s", e)
                     break
 
         except Exception as e:
-            logger.error(f"Stream error: {e}")
+            logger.error("Stream error: %s", e)
         finally:
             self._cleanup()
 
-    def _process_audio(self):
+    def _process_audio(self, frames):
         """Process recorded audio."""
-        if not self.frames:
+        if not frames:
             return
-            
+
         try:
             # Combine frames
-            audio_data = b"".join(self.frames)
+            audio_data = b"".join(frames)
             
             # Create WAV
             wav_io = io.BytesIO()
@@ -153,13 +159,13 @@ class RealTimeVoiceInput:
             
             text = response.strip()
             if text and len(text) > 1:
-                logger.info(f"Transcribed: {text}")
+                logger.info("Transcribed: %s", text)
                 if self.transcript_callback:
                     # Call callback in main thread to avoid Streamlit issues
                     self.transcript_callback(text)
             
         except Exception as e:
-            logger.error(f"Transcription error: {e}")
+            logger.error("Transcription error: %s", e)
 
     def _cleanup(self):
         """Clean up audio stream."""
@@ -205,6 +211,7 @@ class RealTimeVoiceInput:
     def cleanup(self):
         """Cleanup everything."""
         self.stop_recording()
+        self._process_executor.shutdown(wait=False)
         try:
             self.audio.terminate()
         except:
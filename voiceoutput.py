@@ -67,17 +67,21 @@ class VoiceOutput:
         </speak>
         """
 
+    # Built once at class definition instead of per speak() call
+    _VALID_EMOTIONS = frozenset({
+        "empathetic", "friendly", "gentle",
+        "cheerful", "supportive", "hopeful", "sorry"
+    })
+
     async def speak(self, text: str, emotion: Optional[str] = None) -> bool:
         try:
-            valid_emotions = [
-                "empathetic", "friendly", "gentle",
-                "cheerful", "supportive", "hopeful", "sorry"
-            ]
-            style = emotion if emotion in valid_emotions else None
+            style = emotion if emotion in self._VALID_EMOTIONS else None
             ssml = self._create_ssml(text, style)
 
             synthesizer = speechsdk.SpeechSynthesizer(self.speech_config, None)
-            result = synthesizer.speak_ssml_async(ssml).get()
+            # .get() blocks until Azure returns the audio; parked on a
+            # worker thread so the event loop keeps serving other sessions
+            result = await asyncio.to_thread(synthesizer.speak_ssml_async(ssml).get)
 
             if result.reason == speechsdk.ResultReason.SynthesizingAudioCompleted:
                 await self._play_audio(result.audio_data)
@@ -125,15 +129,17 @@ class TherapeuticVoiceManager:
             await self.voice_output.speak(chunk, emotion)
             await asyncio.sleep(0.3)
 
+    # Mood-to-emotion mapping shared by all instances
+    _MOOD_EMOTIONS = {
+        "sad": "empathetic",
+        "anxious": "gentle",
+        "happy": "friendly",
+        "angry": "supportive",
+        "neutral": "empathetic",
+    }
+
     def _get_emotion_for_mood(self, mood: Optional[str]) -> str:
-        mood_map = {
-            "sad": "empathetic",
-            "anxious": "gentle",
-            "happy": "friendly",
-            "angry": "supportive",
-            "neutral": "empathetic",
-        }
-        return mood_map.get(mood, "empathetic")
+        return self._MOOD_EMOTIONS.get(mood, "empathetic")
 
     def _split_text(self, text: str, max_length: int = 600) -> list:
         if len(text) <= max_length: